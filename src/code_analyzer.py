@@ -1,22 +1,77 @@
 # src/code_analyzer.py
-from tree_sitter import Language, Parser, Node
+from tree_sitter import Language, Parser, Node, Query, Tree
 import os
 import tree_sitter_python as tspython
 import tree_sitter_javascript as tsjavascript
 import tree_sitter_typescript as tstypescript
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Iterator, Callable, cast
 import hashlib
 import datetime
+import pickle
+import threading
+import sys
+import logging
+from contextlib import contextmanager
 
-@dataclass
+# Status lines go through this logger at INFO (the CLI shows them with --verbose), so analysis workers never write
+# to a stdout they don't own. Per-definition progress is at DEBUG so the hot path pays nothing unless it is enabled.
+logger = logging.getLogger(__name__)
+
+# Pickles of the pure-Python data classes and of their mypyc-compiled versions can't be loaded by the
+# other build, so each build keys its own AnalysisCache entries.
+_BUILD_FLAVOR = 'py' if __file__.endswith(('.py', '.pyc')) else 'compiled'
+
+# Identifiers and type names longer than this are rarely repeated, so they are not worth interning.
+_INTERN_MAX_LENGTH = 40
+
+def _intern_identifier(text: str) -> str:
+    """Interns short identifier text so repeated names (`self`, `i`, `str`) share one string object."""
+    return sys.intern(text) if len(text) <= _INTERN_MAX_LENGTH else text
+
+# Grammars and compiled queries never change once built, so all analyzers of a grammar share them.
+# Building a Language is cheap, but compiling a Query takes milliseconds.
+_LANGUAGES: Dict[str, Language] = {}
+_QUERIES: Dict[Tuple[str, str], Query] = {}
+
+def _shared_language(grammar: str, language_factory: Callable[[], Any]) -> Language:
+    """Returns the process-wide Language for `grammar`, building it from `language_factory()` on first use."""
+    language = _LANGUAGES.get(grammar)
+    if language is None:
+        language = _LANGUAGES[grammar] = Language(language_factory())
+    return language
+
+def _shared_query(grammar: str, source: str) -> Query:
+    """Returns the process-wide compiled query for `source` against `grammar`'s shared Language."""
+    query = _QUERIES.get((grammar, source))
+    if query is None:
+        query = _QUERIES[(grammar, source)] = Query(_LANGUAGES[grammar], source)
+    return query
+
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    """Length of the longest common prefix, found by bisecting with C-level slice comparisons."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _point_at(source_code_bytes: bytes, offset: int) -> Tuple[int, int]:
+    """The tree-sitter (row, byte column) point of a byte offset."""
+    row = source_code_bytes.count(b'\n', 0, offset)
+    return (row, offset - (source_code_bytes.rfind(b'\n', 0, offset) + 1))
+
+@dataclass(slots=True)
 class ParameterInfo:
     """Represents information about a function parameter."""
     name: str
     default_value: Optional[str] = None
     type_annotation: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class VariableInfo:
     """Represents information about a variable definition/assignment."""
     name: str
@@ -28,30 +83,90 @@ class VariableInfo:
     defined_at_line: int = -1
     parent_scope: Optional[str] = None
 
-@dataclass
-class FunctionInfo:
+class _LazyBodyMixin:
+    """Keeps a definition's body as a byte range into the shared source and decodes it on demand."""
+    __slots__ = ()
+    body_range: Optional[Tuple[int, int]]
+    source_code_bytes: Optional[bytes]
+
+    def get_body(self, source_code_bytes: Optional[bytes] = None) -> Optional[str]:
+        """Decodes the body text from `body_range`; done only when a caller actually needs it."""
+        source_code_bytes = source_code_bytes if source_code_bytes is not None else self.source_code_bytes
+        if self.body_range is None or source_code_bytes is None:
+            return None
+        start_byte, end_byte = self.body_range
+        return source_code_bytes[start_byte:end_byte].decode('utf8')
+
+    @property
+    def body(self) -> Optional[str]:
+        return self.get_body()
+
+    def get_body_preview(self, max_chars: int) -> Optional[str]:
+        """Decodes only the first `max_chars` characters of the body, e.g. for summaries."""
+        if self.body_range is None or self.source_code_bytes is None:
+            return None
+        start_byte, end_byte = self.body_range
+        # A UTF-8 character is at most 4 bytes, so this window always holds max_chars whole characters;
+        # a character cut at the window's end is dropped by 'ignore' and then sliced away anyway.
+        window = self.source_code_bytes[start_byte:min(end_byte, start_byte + 4 * max_chars)]
+        return window.decode('utf8', errors='ignore')[:max_chars]
+
+@dataclass(slots=True)
+class FunctionInfo(_LazyBodyMixin):
     """Represents information about a function."""
     name: str
     start_line: int
     end_line: int
     parameters: List[ParameterInfo] = field(default_factory=list)
     docstring: Optional[str] = None
-    body: Optional[str] = None
+    body_range: Optional[Tuple[int, int]] = None
     variables: List[VariableInfo] = field(default_factory=list)
     calls_made: List[str] = field(default_factory=list)
+    source_code_bytes: Optional[bytes] = field(default=None, repr=False, compare=False)
 
-@dataclass
-class ClassInfo:
+@dataclass(slots=True)
+class ClassInfo(_LazyBodyMixin):
     """Represents information about a class."""
     name: str
     start_line: int
     end_line: int
     docstring: Optional[str] = None
     methods: List[FunctionInfo] = field(default_factory=list)
-    body: Optional[str] = None
+    body_range: Optional[Tuple[int, int]] = None
     attributes: List[VariableInfo] = field(default_factory=list)
+    source_code_bytes: Optional[bytes] = field(default=None, repr=False, compare=False)
+
+@dataclass(slots=True)
+class TextEdit:
+    """Describes one source edit in the form tree-sitter's Tree.edit expects (points are (row, column))."""
+    start_byte: int
+    old_end_byte: int
+    new_end_byte: int
+    start_point: Tuple[int, int]
+    old_end_point: Tuple[int, int]
+    new_end_point: Tuple[int, int]
+
+    @classmethod
+    def between(cls, old_source: bytes, new_source: bytes) -> 'TextEdit':
+        """The single edit turning `old_source` into `new_source`: everything between their common prefix and suffix."""
+        start = _common_prefix_length(old_source, new_source)
+        # Reversing the remainders turns the common suffix into a common prefix; bounded so it can't overlap `start`.
+        suffix = _common_prefix_length(old_source[start:][::-1], new_source[start:][::-1])
+        old_end = len(old_source) - suffix
+        new_end = len(new_source) - suffix
+        return cls(start, old_end, new_end, _point_at(old_source, start),
+                   _point_at(old_source, old_end), _point_at(new_source, new_end))
+
+def _edits_fit(edits: List[TextEdit], old_length: int, new_length: int) -> bool:
+    """Whether applying `edits` in order stays inside a source of `old_length` bytes and ends at `new_length`."""
+    length = old_length
+    for edit in edits:
+        if not (0 <= edit.start_byte <= edit.old_end_byte <= length and edit.start_byte <= edit.new_end_byte):
+            return False
+        length += edit.new_end_byte - edit.old_end_byte
+    return length == new_length
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisResults:
     """Aggregated results of the code analysis."""
     file_path: str
@@ -59,302 +174,530 @@ class AnalysisResults:
     top_level_variables: List[VariableInfo] = field(default_factory=list)
     functions: List[FunctionInfo] = field(default_factory=list)
     classes: List[ClassInfo] = field(default_factory=list)
+    # Kept even when the analysis was run with retain=False and the lists above are emptied.
+    function_count: int = 0
+    class_count: int = 0
+    # Top-level ERROR nodes tree-sitter produced for syntax errors; their contents are skipped.
+    error_count: int = 0
+
+    def attach_source(self, source_code_bytes: Optional[bytes]) -> None:
+        """Points every function, method and class at `source_code_bytes`, which their lazy bodies slice."""
+        for class_info in self.classes:
+            class_info.source_code_bytes = source_code_bytes
+            for method in class_info.methods:
+                method.source_code_bytes = source_code_bytes
+        for function_info in self.functions:
+            function_info.source_code_bytes = source_code_bytes
 
 class CodeAnalyzer:
-    def __init__(self, language_name: str, db_manager, file_extension: str = None):
+    # Call sites whose callee is a plain name or a member/attribute access; @name is the reported call name.
+    _CALL_QUERY_PYTHON = """
+    (call function: [(identifier) @name
+                     (attribute attribute: (identifier) @name)]) @call
+    """
+    _CALL_QUERY_JAVASCRIPT = """
+    (call_expression function: [(identifier) @name
+                                (member_expression property: (_) @name)]) @call
+    """
+    # Definitions directly under the root. Run with a max start depth of 1 so the query cursor
+    # never descends past the root's children; ERROR is matched on its own since it can't be a child pattern.
+    _TOPLEVEL_QUERY_PYTHON = """
+    (module (function_definition) @function)
+    (module (class_definition) @class)
+    (ERROR) @error
+    """
+    _TOPLEVEL_QUERY_JAVASCRIPT = """
+    (program (function_declaration) @function)
+    (program (lexical_declaration (variable_declarator value: (arrow_function)) @arrow))
+    (program (class_declaration) @class)
+    (ERROR) @error
+    """
+
+    # kind_id used for node kinds the active grammar lacks; tree-sitter kind ids are never negative.
+    _MISSING_KIND = -1
+    # Distinct parameter-list texts remembered per analyzer before the memo is reset.
+    _PARAMETERS_MEMO_LIMIT = 4096
+    # Files whose last tree is kept for incremental reparsing; the least recently analyzed is dropped first.
+    _TREE_CACHE_SIZE = 100
+    # Bump whenever the pickled data classes change shape, or the analysis records different values for the
+    # same source, so stale cache rows read as misses.
+    _CACHE_FORMAT_VERSION = 5
+
+    def __init__(self, language_name: str, db_manager: Any, file_extension: Optional[str] = None):
         self.db_manager = db_manager
         self.language = language_name.lower()
         self.file_extension = file_extension.lower() if file_extension else None
         try:
             if self.language == "python":
-                self.parser = Parser(Language(tspython.language()))
-                print("Code Analyzer: Python Tree-sitter parser initialized.")
+                self._grammar = 'python'
+                self.parser = Parser(_shared_language(self._grammar, tspython.language))
+                logger.info("Code Analyzer: Python Tree-sitter parser initialized.")
             elif self.language == "javascript":
                 if self.file_extension == "ts":
                     try:
-                        self.parser = Parser(Language(tstypescript.typescript()))
-                        print("Code Analyzer: TypeScript Tree-sitter parser initialized.")
+                        self._grammar = 'typescript'
+                        self.parser = Parser(_shared_language(self._grammar, tstypescript.typescript))  # type: ignore[attr-defined]
+                        logger.info("Code Analyzer: TypeScript Tree-sitter parser initialized.")
                     except AttributeError:
                         try:
-                            self.parser = Parser(Language(tstypescript.language_typescript()))
-                            print("Code Analyzer: TypeScript Tree-sitter parser initialized (using language_typescript).")
+                            self.parser = Parser(_shared_language(self._grammar, tstypescript.language_typescript))
+                            logger.info("Code Analyzer: TypeScript Tree-sitter parser initialized (using language_typescript).")
                         except AttributeError as e:
                             print(f"Error: Failed to initialize TypeScript parser: {e}")
                             print("Please ensure `tree-sitter-typescript` is installed correctly and has `typescript` or `language_typescript` attribute.")
                             exit(1)
                 else:
-                    self.parser = Parser(Language(tsjavascript.language()))
-                    print("Code Analyzer: JavaScript Tree-sitter parser initialized.")
+                    self._grammar = 'javascript'
+                    self.parser = Parser(_shared_language(self._grammar, tsjavascript.language))
+                    logger.info("Code Analyzer: JavaScript Tree-sitter parser initialized.")
             else:
                 raise ValueError(f"Unsupported language: {language_name}")
         except Exception as e:
             print(f"Error initializing parser for {language_name}: {e}")
             print(f"Please ensure `tree-sitter-{language_name.lower()}`{' or tree-sitter-typescript' if self.file_extension == 'ts' else ''} is installed and compatible.")
             exit(1)
+        self._ts_language = cast(Language, self.parser.language)
+        # tree-sitter parsers are not thread-safe, so each worker thread lazily gets its own.
+        self._thread_local = threading.local()
+        self._thread_local.parser = self.parser
+        # Last tree parsed per path with the source it was parsed from, kept so re-analysis can reparse incrementally.
+        self._tree_cache: Dict[str, Tuple[Tree, bytes]] = {}
+        # Source bytes of the file currently being analyzed; set by _binding for the duration of a walk.
+        self._src = b''
+        # The same source decoded once when it is pure ASCII, so byte offsets index it directly; None otherwise.
+        self._text: Optional[str] = None
+        # (name, default_value, type_annotation) of parsed parameters, keyed by the raw text of their parameter
+        # list; see _extract_parameters.
+        self._parameters_memo: Dict[bytes, Tuple[Tuple[str, Optional[str], Optional[str]], ...]] = {}
+        self._init_node_kinds(self._ts_language)
+        self._init_parameter_handlers()
+        self._call_query = _shared_query(self._grammar, self._CALL_QUERY_PYTHON if self.language == 'python' else self._CALL_QUERY_JAVASCRIPT)
+        self._toplevel_query = _shared_query(self._grammar, self._TOPLEVEL_QUERY_PYTHON if self.language == 'python' else self._TOPLEVEL_QUERY_JAVASCRIPT)
+        self._toplevel_query.set_max_start_depth(1)
+
+    def _init_node_kinds(self, ts_language: Language) -> None:
+        """Precompute the grammar's integer kind_ids so hot loops compare ints instead of node type strings.
+
+        Kinds the grammar does not define map to _MISSING_KIND, so every kind is a plain int (which mypyc
+        compiles to native comparisons) and never equals a real node's kind_id.
+        """
+        def kind_id(kind: str, named: bool = True) -> int:
+            found = ts_language.id_for_node_kind(kind, named)
+            return self._MISSING_KIND if found is None else found
+
+        def kind_ids(*kinds: str) -> frozenset[int]:
+            ids = set()
+            for kind in kinds:
+                ids.add(kind_id(kind, True))
+                ids.add(kind_id(kind, False))
+            ids.discard(self._MISSING_KIND)
+            return frozenset(ids)
 
-    def _get_node_text(self, node: Node, source_code_bytes: bytes) -> str:
+        self._KIND_ERROR = kind_id('ERROR')
+        self._KIND_EQUALS = kind_id('=', False)
+        self._KIND_IDENTIFIER = kind_id('identifier')
+        self._KIND_TYPE = kind_id('type')
+        self._KIND_DEFAULT = kind_id('default')
+        self._KIND_DEFAULT_PARAMETER = kind_id('default_parameter')
+        self._KIND_PARAMETER = kind_id('parameter')
+        self._KIND_REQUIRED_PARAMETER = kind_id('required_parameter')
+        self._KIND_OPTIONAL_PARAMETER = kind_id('optional_parameter')
+        self._KIND_TYPE_ANNOTATION = kind_id('type_annotation')
+        self._KIND_ASSIGNMENT_EXPRESSION = kind_id('assignment_expression')
+        self._KIND_STRING = kind_id('string')
+        self._KIND_EXPRESSION_STATEMENT = kind_id('expression_statement')
+        self._KIND_ASSIGNMENT = kind_id('assignment')
+        self._KIND_VARIABLE_DECLARATOR = kind_id('variable_declarator')
+        self._KIND_ARROW_FUNCTION = kind_id('arrow_function')
+        self._KIND_PUBLIC_FIELD_DEFINITION = kind_id('public_field_definition')
+        self._KIND_CALL = kind_id('call')
+        self._KIND_CALL_EXPRESSION = kind_id('call_expression')
+        self._KIND_MEMBER_EXPRESSION = kind_id('member_expression')
+        self._KIND_ATTRIBUTE = kind_id('attribute')
+        self._KIND_METHOD = kind_id('function_definition' if self.language == 'python' else 'method_definition')
+
+        self._TYPED_PARAMETER_KINDS = kind_ids('typed_parameter', 'typed_default_parameter')
+        self._TS_DEFAULT_VALUE_KINDS = kind_ids('number', 'string', 'identifier')
+        self._WILDCARD_PARAMETER_KINDS = kind_ids('positional_wildcard_parameter', 'keyword_wildcard_parameter')
+        self._JS_DECLARATION_KINDS = kind_ids('variable_declaration', 'lexical_declaration')
+        # Python statements only nest inside these containers, so variable extraction never needs to enter expressions.
+        self._PY_VARIABLE_DESCEND_KINDS = kind_ids(
+            'module', 'block', 'if_statement', 'elif_clause', 'else_clause', 'for_statement', 'while_statement',
+            'try_statement', 'except_clause', 'except_group_clause', 'finally_clause', 'with_statement',
+            'match_statement', 'case_clause', 'function_definition', 'class_definition', 'decorated_definition')
+        self._PY_DEFINITION_KINDS = kind_ids('function_definition', 'class_definition')
+        self._PY_GLOBAL_VARIABLE_DESCEND_KINDS = self._PY_VARIABLE_DESCEND_KINDS - self._PY_DEFINITION_KINDS
+        self._JS_VARIABLE_SKIP_DESCEND_KINDS = kind_ids(
+            'variable_declaration', 'lexical_declaration', 'function_declaration', 'class_declaration',
+            'method_definition', 'public_field_definition', 'arrow_function')
+        self._PY_CALL_SKIP_DESCEND_KINDS = kind_ids('function_definition', 'class_definition', 'lambda')
+        self._JS_CALL_SKIP_DESCEND_KINDS = kind_ids('function_declaration', 'class_declaration', 'arrow_function', 'method_definition')
+
+    def _get_parser(self) -> Parser:
+        """Returns the parser owned by the calling thread, creating it on first use."""
+        parser = getattr(self._thread_local, 'parser', None)
+        if parser is None:
+            parser = Parser(self._ts_language)
+            self._thread_local.parser = parser
+        return parser
+
+    def parse(self, source_code_bytes: bytes) -> Tree:
+        """Parses source bytes with the calling thread's parser. Safe to call from worker threads."""
+        return self._get_parser().parse(source_code_bytes)
+
+    def _reparse(self, file_path: str, source_code_bytes: bytes) -> Tree:
+        """Parses `file_path`'s new source, incrementally from its previous tree when one is cached."""
+        # Popped, not read: the old tree is edited in place below, so it must not stay cached if anything fails.
+        # analyze_code remembers whichever tree comes out of this.
+        cached = self._tree_cache.pop(file_path, None)
+        if cached is None:
+            return self.parse(source_code_bytes)
+        old_tree, old_source = cached
+        edit = TextEdit.between(old_source, source_code_bytes)
+        try:
+            old_tree.edit(
+                start_byte=edit.start_byte,
+                old_end_byte=edit.old_end_byte,
+                new_end_byte=edit.new_end_byte,
+                start_point=edit.start_point,
+                old_end_point=edit.old_end_point,
+                new_end_point=edit.new_end_point
+            )
+            return self._get_parser().parse(source_code_bytes, old_tree)
+        except (ValueError, TypeError, SystemError) as e:
+            # What the bindings raise for an edit they reject or a failed parse; either way a bug, not bad input.
+            logger.warning("Code Analyzer: Incremental reparse of '%s' failed (%s); parsing from scratch.", file_path, e)
+            return self.parse(source_code_bytes)
+
+    def _remember_tree(self, file_path: str, tree: Tree, source_code_bytes: bytes) -> None:
+        """Caches the latest tree of a file for `_reparse`, evicting the least recently analyzed file when full."""
+        self._tree_cache.pop(file_path, None)
+        self._tree_cache[file_path] = (tree, source_code_bytes)
+        if len(self._tree_cache) > self._TREE_CACHE_SIZE:
+            del self._tree_cache[next(iter(self._tree_cache))]
+
+    @contextmanager
+    def _binding(self, source_code_bytes: bytes) -> Iterator[None]:
+        """Binds the source being analyzed to `self._src` so node helpers don't need it passed in."""
+        self._src = source_code_bytes
+        self._text = source_code_bytes.decode('ascii') if source_code_bytes.isascii() else None
+        try:
+            yield
+        finally:
+            self._src = b''
+            self._text = None
+
+    def _get_node_text(self, node: Node) -> str:
         """Helper to get the text of a node."""
-        return source_code_bytes[node.start_byte:node.end_byte].decode('utf8')
+        text = self._text
+        if text is not None:
+            return text[node.start_byte:node.end_byte]
+        return self._src[node.start_byte:node.end_byte].decode('utf8')
+
+    def _get_node_bytes(self, node: Node) -> bytes:
+        """Helper to get the raw bytes of a node without decoding them."""
+        return self._src[node.start_byte:node.end_byte]
+
+    def _get_identifier_text(self, node: Node) -> str:
+        """Helper to get the text of a name or type node, interned when short."""
+        return _intern_identifier(self._get_node_text(node))
+
+    def _get_type_annotation(self, node: Node) -> Optional[Node]:
+        """Returns the annotated type of a TS declarator/field via its `type` field, without listing its children."""
+        annotation_node = node.child_by_field_name('type')
+        if annotation_node and annotation_node.kind_id == self._KIND_TYPE_ANNOTATION:
+            return annotation_node.named_child(0)
+        return None
 
-    def _extract_parameters(self, func_node: Node, source_code_bytes: bytes) -> List[ParameterInfo]:
-        parameters = []
+    def _init_parameter_handlers(self) -> None:
+        """Map each parameter node kind_id of the active language to the method that reads it."""
+        handlers: Dict[int, Callable[[Node], Optional[ParameterInfo]]] = {self._KIND_IDENTIFIER: self._param_identifier}
+        if self.language == 'python':
+            handlers[self._KIND_DEFAULT_PARAMETER] = self._param_default
+            for kind in self._TYPED_PARAMETER_KINDS:
+                handlers[kind] = self._param_typed
+            for kind in self._WILDCARD_PARAMETER_KINDS:
+                handlers[kind] = self._param_wildcard
+        elif self.language == 'javascript':
+            handlers[self._KIND_PARAMETER] = self._param_js
+            if self.file_extension == 'ts':
+                handlers[self._KIND_REQUIRED_PARAMETER] = self._param_ts_required
+                handlers[self._KIND_OPTIONAL_PARAMETER] = self._param_ts_optional
+        # Kinds the grammar does not define must never match.
+        handlers.pop(self._MISSING_KIND, None)
+        self._PARAM_HANDLERS = handlers
+
+    def _param_identifier(self, node: Node) -> Optional[ParameterInfo]:
+        return ParameterInfo(name=self._get_identifier_text(node))
+
+    def _param_default(self, node: Node) -> Optional[ParameterInfo]:
+        name_node = node.child_by_field_name('name')
+        value_node = node.child_by_field_name('value')
+        if not name_node:
+            return None
+        param_name = self._get_identifier_text(name_node)
+        param_value = self._get_node_text(value_node) if value_node else None
+        return ParameterInfo(name=param_name, default_value=param_value)
+
+    def _param_typed(self, node: Node) -> Optional[ParameterInfo]:
+        param_name = None
+        param_type = None
+        param_value = None
+        for sub_child in node.children:
+            if sub_child.kind_id == self._KIND_IDENTIFIER:
+                param_name = self._get_identifier_text(sub_child)
+            elif sub_child.kind_id == self._KIND_TYPE:
+                param_type = self._get_identifier_text(sub_child)
+            elif sub_child.kind_id == self._KIND_DEFAULT:
+                param_value = self._get_node_text(sub_child)
+        if not param_name:
+            return None
+        return ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value)
+
+    def _param_js(self, node: Node) -> Optional[ParameterInfo]:
+        param_name = None
+        param_type = None
+        for sub_child in node.named_children:
+            if sub_child.kind_id == self._KIND_IDENTIFIER:
+                param_name = self._get_identifier_text(sub_child)
+            elif sub_child.kind_id == self._KIND_TYPE_ANNOTATION:
+                type_node = sub_child.named_child(0)
+                param_type = self._get_identifier_text(type_node) if type_node else None
+        if not param_name:
+            return None
+        return ParameterInfo(name=param_name, type_annotation=param_type)
+
+    def _param_ts_required(self, node: Node) -> Optional[ParameterInfo]:
+        param_name = None
+        param_type = None
+        param_value = None
+        for sub_child in node.named_children:
+            if sub_child.kind_id == self._KIND_IDENTIFIER:
+                param_name = self._get_identifier_text(sub_child)
+            elif sub_child.kind_id == self._KIND_TYPE_ANNOTATION:
+                type_node = sub_child.named_child(0)
+                param_type = self._get_identifier_text(type_node) if type_node else None
+            elif sub_child.kind_id in self._TS_DEFAULT_VALUE_KINDS:  # Handle default value
+                param_value = self._get_node_text(sub_child)
+        if not param_name:
+            return None
+        return ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value)
+
+    def _param_ts_optional(self, node: Node) -> Optional[ParameterInfo]:
+        param_name = None
+        param_type = None
+        param_value = None
+        for sub_child in node.named_children:
+            if sub_child.kind_id == self._KIND_IDENTIFIER:
+                param_name = self._get_identifier_text(sub_child)
+            elif sub_child.kind_id == self._KIND_TYPE_ANNOTATION:
+                type_node = sub_child.named_child(0)
+                param_type = self._get_identifier_text(type_node) if type_node else None
+            elif sub_child.kind_id == self._KIND_ASSIGNMENT_EXPRESSION:
+                value_node = sub_child.child_by_field_name('right')
+                param_value = self._get_node_text(value_node) if value_node else None
+        if not param_name:
+            return None
+        return ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value)
+
+    def _param_wildcard(self, node: Node) -> Optional[ParameterInfo]:
+        name_node = node.child_by_field_name('name')
+        if not name_node:
+            return None
+        return ParameterInfo(name=self._get_identifier_text(name_node))
+
+    def _extract_parameters(self, func_node: Node) -> List[ParameterInfo]:
+        parameters: List[ParameterInfo] = []
         parameters_node = func_node.child_by_field_name('parameters')
-        print(f"Extracting parameters for node: {self._get_node_text(func_node, source_code_bytes)[:50]}...")
-        if parameters_node:
-            print(f"Parameters node found: {self._get_node_text(parameters_node, source_code_bytes)}")
-            for child in parameters_node.named_children:
-                print(f"Processing parameter node type: {child.type}, text: {self._get_node_text(child, source_code_bytes)}")
-                if child.type == 'identifier':
-                    param_name = self._get_node_text(child, source_code_bytes)
-                    print(f"Found identifier parameter: {param_name}")
-                    parameters.append(ParameterInfo(name=param_name))
-                elif child.type == 'default_parameter' and self.language == 'python':
-                    name_node = child.child_by_field_name('name')
-                    value_node = child.child_by_field_name('value')
-                    if name_node:
-                        param_name = self._get_node_text(name_node, source_code_bytes)
-                        param_value = self._get_node_text(value_node, source_code_bytes) if value_node else None
-                        print(f"Found default parameter: {param_name} = {param_value}")
-                        parameters.append(ParameterInfo(name=param_name, default_value=param_value))
-                elif child.type in ['typed_parameter', 'typed_default_parameter'] and self.language == 'python':
-                    param_name = None
-                    param_type = None
-                    param_value = None
-                    print(f"Inspecting typed_parameter children: {[c.type for c in child.children]}")
-                    for sub_child in child.children:
-                        if sub_child.type == 'identifier':
-                            param_name = self._get_node_text(sub_child, source_code_bytes)
-                        elif sub_child.type == 'type':
-                            param_type = self._get_node_text(sub_child, source_code_bytes)
-                        elif sub_child.type == 'default':
-                            param_value = self._get_node_text(sub_child, source_code_bytes)
-                    if param_name:
-                        print(f"Found typed parameter: {param_name}: {param_type} = {param_value}")
-                        parameters.append(ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value))
-                    else:
-                        print(f"Skipping typed_parameter, no name found")
-                elif child.type == 'parameter' and self.language == 'javascript':
-                    param_name = None
-                    param_type = None
-                    param_value = None
-                    print(f"Inspecting JS parameter children: {[c.type for c in child.named_children]}")
-                    for sub_child in child.named_children:
-                        if sub_child.type == 'identifier':
-                            param_name = self._get_node_text(sub_child, source_code_bytes)
-                        elif sub_child.type == 'type_annotation':
-                            type_node = sub_child.named_child(0)
-                            param_type = self._get_node_text(type_node, source_code_bytes) if type_node else None
-                    if param_name:
-                        print(f"Found JS parameter: {param_name}: {param_type} = {param_value}")
-                        parameters.append(ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value))
-                    else:
-                        print(f"Skipping JS parameter, no name found")
-                elif child.type == 'required_parameter' and self.language == 'javascript' and self.file_extension == 'ts':
-                    param_name = None
-                    param_type = None
-                    param_value = None
-                    print(f"Inspecting TS required_parameter children: {[c.type for c in child.named_children]}")
-                    for sub_child in child.named_children:
-                        if sub_child.type == 'identifier':
-                            param_name = self._get_node_text(sub_child, source_code_bytes)
-                        elif sub_child.type == 'type_annotation':
-                            type_node = sub_child.named_child(0)
-                            param_type = self._get_node_text(type_node, source_code_bytes) if type_node else None
-                        elif sub_child.type in ['number', 'string', 'identifier']:  # Handle default value
-                            param_value = self._get_node_text(sub_child, source_code_bytes)
-                    if param_name:
-                        print(f"Found TS required parameter: {param_name}: {param_type} = {param_value}")
-                        parameters.append(ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value))
-                    else:
-                        print(f"Skipping TS required_parameter, no name found")
-                elif child.type == 'optional_parameter' and self.language == 'javascript' and self.file_extension == 'ts':
-                    param_name = None
-                    param_type = None
-                    param_value = None
-                    print(f"Inspecting TS optional_parameter children: {[c.type for c in child.named_children]}")
-                    for sub_child in child.named_children:
-                        if sub_child.type == 'identifier':
-                            param_name = self._get_node_text(sub_child, source_code_bytes)
-                        elif sub_child.type == 'type_annotation':
-                            type_node = sub_child.named_child(0)
-                            param_type = self._get_node_text(type_node, source_code_bytes) if type_node else None
-                        elif sub_child.type == 'assignment_expression':
-                            value_node = sub_child.child_by_field_name('right')
-                            param_value = self._get_node_text(value_node, source_code_bytes) if value_node else None
-                    if param_name:
-                        print(f"Found TS optional parameter: {param_name}: {param_type} = {param_value}")
-                        parameters.append(ParameterInfo(name=param_name, type_annotation=param_type, default_value=param_value))
-                    else:
-                        print(f"Skipping TS optional_parameter, no name found")
-                elif child.type in ['positional_wildcard_parameter', 'keyword_wildcard_parameter'] and self.language == 'python':
-                    name_node = child.child_by_field_name('name')
-                    if name_node:
-                        param_name = self._get_node_text(name_node, source_code_bytes)
-                        print(f"Found wildcard parameter: {param_name}")
-                        parameters.append(ParameterInfo(name=param_name))
-                else:
-                    print(f"Skipping parameter node type: {child.type}")
-        else:
-            print("No parameters node found.")
-        print(f"Extracted parameters: {[p.name for p in parameters]}")
+        if not parameters_node:
+            return parameters
+        # Parameter lists repeat heavily (`(self)`, `(self, other)`), and the result depends only on their text.
+        parameters_text = self._get_node_bytes(parameters_node)
+        memoized = self._parameters_memo.get(parameters_text)
+        # Only the field values are memoized: every function gets its own ParameterInfo objects, which callers
+        # may mutate.
+        if memoized is not None:
+            return [ParameterInfo(name, default_value, type_annotation)
+                    for name, default_value, type_annotation in memoized]
+        handlers = self._PARAM_HANDLERS
+        for child in parameters_node.named_children:
+            handler = handlers.get(child.kind_id)
+            if handler:
+                param_info = handler(child)
+                if param_info:
+                    parameters.append(param_info)
+        if len(self._parameters_memo) >= self._PARAMETERS_MEMO_LIMIT:
+            self._parameters_memo.clear()
+        self._parameters_memo[parameters_text] = tuple((p.name, p.default_value, p.type_annotation) for p in parameters)
         return parameters
 
-    def _extract_variables(self, scope_node: Node, source_code_bytes: bytes,
+    def _extract_variables(self, scope_node: Node,
                           is_global: bool = False, is_class_attribute: bool = False,
                           is_function_local: bool = False) -> List[VariableInfo]:
-        variables = []
-        seen_variables = set()
-        print(f"Extracting variables with is_global={is_global}, is_class_attribute={is_class_attribute}, is_function_local={is_function_local}")
-        print(f"Scope node type: {scope_node.type}")
+        # The language is fixed per analyzer, so pick the specialized walk once instead of testing it per node.
+        if self.language == 'python':
+            return self._extract_python_variables(scope_node, is_global, is_class_attribute, is_function_local)
+        return self._extract_javascript_variables(scope_node, is_global, is_class_attribute, is_function_local)
+
+    def _extract_python_variables(self, scope_node: Node, is_global: bool, is_class_attribute: bool,
+                                  is_function_local: bool) -> List[VariableInfo]:
+        variables: List[VariableInfo] = []
+        expression_statement_kind = self._KIND_EXPRESSION_STATEMENT
+        # ERROR is not a descend kind, so malformed regions are skipped without a separate check.
+        descend_kinds = self._PY_GLOBAL_VARIABLE_DESCEND_KINDS if is_global else self._PY_VARIABLE_DESCEND_KINDS
 
         cursor = scope_node.walk()
-        if cursor.goto_first_child():
-            while True:
-                node = cursor.node
-                print(f"Processing node type: {node.type}, text: {self._get_node_text(node, source_code_bytes)[:100]}...")
-                if node.type == 'ERROR':
-                    print(f"Skipping ERROR node: {self._get_node_text(node, source_code_bytes)}")
-                    if not cursor.goto_next_sibling():
-                        break
-                    continue
-                if self.language == 'python' and node.type == 'expression_statement':
-                    expression_node = node.named_child(0)
-                    if expression_node:
-                        print(f"Expression statement children: {[c.type for c in expression_node.named_children]}")
-                        print(f"Expression statement all children: {[c.type for c in expression_node.children]}")
-                        if expression_node.type == 'assignment':
-                            name_node = expression_node.named_child(0)
-                            if name_node and name_node.type == 'identifier':
-                                var_name = self._get_node_text(name_node, source_code_bytes)
-                                if var_name not in seen_variables:
-                                    var_type = None
-                                    var_value = None
-                                    if len(expression_node.named_children) >= 3 and expression_node.named_child(1).type == 'type':
-                                        var_type = self._get_node_text(expression_node.named_child(1), source_code_bytes)
-                                        for i, child in enumerate(expression_node.children):
-                                            if child.type == '=':
-                                                value_node = expression_node.children[i + 1] if i + 1 < len(expression_node.children) else None
-                                                var_value = self._get_node_text(value_node, source_code_bytes) if value_node else None
-                                                print(f"Value node index: {i + 1}, type: {value_node.type if value_node else 'None'}, value: {var_value}")
-                                                break
-                                        print(f"Found annotated assignment: {var_name}: {var_type} = {var_value}")
-                                    else:
-                                        right_side = expression_node.named_child(1) if len(expression_node.named_children) > 1 else None
-                                        var_value = self._get_node_text(right_side, source_code_bytes) if right_side else None
-                                        print(f"Found assignment: {var_name} = {var_value}")
-                                    variables.append(VariableInfo(
-                                        name=var_name,
-                                        value=var_value,
-                                        type_annotation=var_type,
-                                        is_global=is_global,
-                                        is_class_attribute=is_class_attribute,
-                                        is_function_local=is_function_local,
-                                        defined_at_line=name_node.start_point[0] + 1
-                                    ))
-                                    seen_variables.add(var_name)
-                        else:
-                            print(f"Skipping expression_statement with child type: {expression_node.type}")
-                elif self.language == 'javascript' and node.type in ['variable_declaration', 'lexical_declaration']:
-                    print(f"JS declaration node text: {self._get_node_text(node, source_code_bytes)}")
-                    print(f"JS declaration children: {[c.type for c in node.children]}")
-                    for declarator in node.named_children:
-                        if declarator.type == 'variable_declarator':
-                            name_node = declarator.child_by_field_name('name')
-                            value_node = declarator.child_by_field_name('value')
-                            type_node = None
-                            for child in declarator.children:
-                                if child.type == 'type_annotation':
-                                    type_node = child.named_child(0)
-                                    break
-                            if name_node:
-                                var_name = self._get_node_text(name_node, source_code_bytes)
-                                if var_name not in seen_variables:
-                                    var_type = self._get_node_text(type_node, source_code_bytes) if type_node else None
-                                    var_value = self._get_node_text(value_node, source_code_bytes) if value_node else None
-                                    print(f"Found variable declaration: {var_name}: {var_type} = {var_value}")
-                                    if value_node and value_node.type != 'arrow_function':
-                                        variables.append(VariableInfo(
-                                            name=var_name,
-                                            value=var_value,
-                                            type_annotation=var_type,
-                                            is_global=is_global,
-                                            is_class_attribute=is_class_attribute,
-                                            is_function_local=is_function_local,
-                                            defined_at_line=name_node.start_point[0] + 1
-                                        ))
-                                        seen_variables.add(var_name)
-                elif self.language == 'javascript' and node.type == 'public_field_definition' and is_class_attribute:
-                    name_node = node.child_by_field_name('name')
-                    value_node = node.child_by_field_name('value')
-                    type_node = None
-                    for child in node.children:
-                        if child.type == 'type_annotation':
-                            type_node = child.named_child(0)
-                            break
-                    if name_node:
-                        var_name = self._get_node_text(name_node, source_code_bytes)
-                        if var_name not in seen_variables:
-                            var_type = self._get_node_text(type_node, source_code_bytes) if type_node else None
-                            var_value = self._get_node_text(value_node, source_code_bytes) if value_node else None
-                            print(f"Found class attribute: {var_name}: {var_type} = {var_value}")
-                            variables.append(VariableInfo(
-                                name=var_name,
-                                value=var_value,
-                                type_annotation=var_type,
-                                is_global=is_global,
-                                is_class_attribute=is_class_attribute,
-                                is_function_local=is_function_local,
-                                defined_at_line=name_node.start_point[0] + 1
-                            ))
-                            seen_variables.add(var_name)
-                if self.language == 'python' and node.type not in ['assignment', 'annotated_assignment'] and \
-                   (not is_global or node.type not in ['function_definition', 'class_definition']):
-                    variables.extend(self._extract_variables(node, source_code_bytes, is_global, is_class_attribute, is_function_local))
-                elif self.language == 'javascript' and node.type not in ['variable_declaration', 'lexical_declaration', 'function_declaration', 'class_declaration', 'method_definition', 'public_field_definition', 'arrow_function']:
-                    variables.extend(self._extract_variables(node, source_code_bytes, is_global, is_class_attribute, is_function_local))
-                if not cursor.goto_next_sibling():
-                    break
-        print(f"Extracted variables: {[v.name for v in variables]}")
-        return variables
+        if not cursor.goto_first_child():
+            return variables
+        # One seen-set per sibling level keeps the per-scope de-duplication of the old recursive walk.
+        seen_stack: List[set[bytes]] = [set()]
+        while True:
+            node = cursor.node
+            assert node is not None
+            seen_variables = seen_stack[-1]
+            kind = node.kind_id
+            if kind == expression_statement_kind:
+                expression_node = node.named_child(0)
+                if expression_node:
+                    if expression_node.kind_id == self._KIND_ASSIGNMENT:
+                        name_node = expression_node.child_by_field_name('left')
+                        if name_node and name_node.kind_id == self._KIND_IDENTIFIER:
+                            name_bytes = self._get_node_bytes(name_node)
+                            if name_bytes not in seen_variables:
+                                var_name = _intern_identifier(name_bytes.decode('utf8'))
+                                type_node = expression_node.child_by_field_name('type')
+                                value_node = expression_node.child_by_field_name('right')
+                                var_type = self._get_identifier_text(type_node) if type_node else None
+                                var_value = self._get_node_text(value_node) if value_node else None
+                                variables.append(VariableInfo(
+                                    name=var_name,
+                                    value=var_value,
+                                    type_annotation=var_type,
+                                    is_global=is_global,
+                                    is_class_attribute=is_class_attribute,
+                                    is_function_local=is_function_local,
+                                    defined_at_line=name_node.start_point[0] + 1
+                                ))
+                                seen_variables.add(name_bytes)
+            if kind in descend_kinds and cursor.goto_first_child():
+                seen_stack.append(set())
+                continue
+            while not cursor.goto_next_sibling():
+                cursor.goto_parent()
+                seen_stack.pop()
+                if not seen_stack:
+                    return variables
+
+    def _extract_javascript_variables(self, scope_node: Node, is_global: bool, is_class_attribute: bool,
+                                      is_function_local: bool) -> List[VariableInfo]:
+        variables: List[VariableInfo] = []
+        declaration_kinds = self._JS_DECLARATION_KINDS
+        field_kind = self._KIND_PUBLIC_FIELD_DEFINITION if is_class_attribute else self._MISSING_KIND
+        skip_descend_kinds = self._JS_VARIABLE_SKIP_DESCEND_KINDS
+        error_kind = self._KIND_ERROR
+
+        cursor = scope_node.walk()
+        if not cursor.goto_first_child():
+            return variables
+        # One seen-set per sibling level keeps the per-scope de-duplication of the old recursive walk.
+        seen_stack: List[set[bytes]] = [set()]
+        while True:
+            node = cursor.node
+            assert node is not None
+            seen_variables = seen_stack[-1]
+            kind = node.kind_id
+            if kind in declaration_kinds:
+                for declarator in node.named_children:
+                    if declarator.kind_id == self._KIND_VARIABLE_DECLARATOR:
+                        name_node = declarator.child_by_field_name('name')
+                        value_node = declarator.child_by_field_name('value')
+                        # Arrow functions are reported as functions, so skip them before decoding their bodies.
+                        if name_node and value_node and value_node.kind_id != self._KIND_ARROW_FUNCTION:
+                            name_bytes = self._get_node_bytes(name_node)
+                            if name_bytes not in seen_variables:
+                                type_node = self._get_type_annotation(declarator)
+                                var_type = self._get_identifier_text(type_node) if type_node else None
+                                variables.append(VariableInfo(
+                                    name=_intern_identifier(name_bytes.decode('utf8')),
+                                    value=self._get_node_text(value_node),
+                                    type_annotation=var_type,
+                                    is_global=is_global,
+                                    is_class_attribute=is_class_attribute,
+                                    is_function_local=is_function_local,
+                                    defined_at_line=name_node.start_point[0] + 1
+                                ))
+                                seen_variables.add(name_bytes)
+            elif kind == field_kind:
+                name_node = node.child_by_field_name('name')
+                value_node = node.child_by_field_name('value')
+                type_node = self._get_type_annotation(node)
+                if name_node:
+                    name_bytes = self._get_node_bytes(name_node)
+                    if name_bytes not in seen_variables:
+                        var_name = _intern_identifier(name_bytes.decode('utf8'))
+                        var_type = self._get_identifier_text(type_node) if type_node else None
+                        var_value = self._get_node_text(value_node) if value_node else None
+                        variables.append(VariableInfo(
+                            name=var_name,
+                            value=var_value,
+                            type_annotation=var_type,
+                            is_global=is_global,
+                            is_class_attribute=is_class_attribute,
+                            is_function_local=is_function_local,
+                            defined_at_line=name_node.start_point[0] + 1
+                        ))
+                        seen_variables.add(name_bytes)
+            if kind != error_kind and kind not in skip_descend_kinds and cursor.goto_first_child():
+                seen_stack.append(set())
+                continue
+            while not cursor.goto_next_sibling():
+                cursor.goto_parent()
+                seen_stack.pop()
+                if not seen_stack:
+                    return variables
 
-    def _extract_function_calls(self, node: Node, source_code_bytes: bytes) -> List[str]:
+    def _extract_function_calls(self, node: Node) -> List[str]:
+        skip_kinds = self._PY_CALL_SKIP_DESCEND_KINDS if self.language == 'python' else self._JS_CALL_SKIP_DESCEND_KINDS
         calls = []
-        cursor = node.walk()
-        if cursor.goto_first_child():
-            while True:
-                current_node = cursor.node
-                if current_node.type == 'ERROR':
-                    print(f"Skipping ERROR node in function calls: {self._get_node_text(current_node, source_code_bytes)}")
-                    if not cursor.goto_next_sibling():
-                        break
-                    continue
-                if current_node.type == 'call' or (self.language == 'javascript' and current_node.type == 'call_expression'):
-                    function_node = current_node.child_by_field_name('function')
-                    if function_node:
-                        if function_node.type == 'identifier':
-                            calls.append(self._get_node_text(function_node, source_code_bytes))
-                        elif function_node.type == 'member_expression' and self.language == 'javascript':
-                            attribute_name_node = function_node.child_by_field_name('property')
-                            if attribute_name_node:
-                                calls.append(self._get_node_text(attribute_name_node, source_code_bytes))
-                        elif function_node.type == 'attribute' and self.language == 'python':
-                            attribute_name_node = function_node.child_by_field_name('attribute')
-                            if attribute_name_node:
-                                calls.append(self._get_node_text(attribute_name_node, source_code_bytes))
-                if self.language == 'python' and current_node.type not in ['function_definition', 'class_definition', 'lambda']:
-                    calls.extend(self._extract_function_calls(current_node, source_code_bytes))
-                elif self.language == 'javascript' and current_node.type not in ['function_declaration', 'class_declaration', 'arrow_function', 'method_definition']:
-                    calls.extend(self._extract_function_calls(current_node, source_code_bytes))
-                if not cursor.goto_next_sibling():
+        for _, captures in self._call_query.matches(node):
+            call_node = captures['call'][0]
+            # The query matches the whole subtree, so drop calls made from nested functions/classes or
+            # inside ERROR nodes. The scope node itself is not a call of this scope (e.g. `x => f(x)`).
+            ancestor = call_node.parent
+            while ancestor is not None and call_node != node:
+                if ancestor == node:
+                    calls.append(self._get_node_bytes(captures['name'][0]))
                     break
-        return list(set(calls))
+                if ancestor.kind_id in skip_kinds or ancestor.kind_id == self._KIND_ERROR:
+                    break
+                ancestor = ancestor.parent
+        # dict.fromkeys de-duplicates while keeping first-seen source order.
+        return [_intern_identifier(call.decode('utf8')) for call in dict.fromkeys(calls)]
 
-    def _visit_function_definition(self, node: Node, source_code_bytes: bytes, file_id: int, class_id: Optional[int] = None, is_arrow: bool = False) -> Optional[FunctionInfo]:
+    def _extract_docstring(self, body_node: Optional[Node]) -> Optional[str]:
+        """Returns the docstring that opens a Python body, with its prefix and quotes removed."""
+        if self.language != 'python' or not body_node or not body_node.children:
+            return None
+        first_child = body_node.children[0]
+        if first_child.kind_id != self._KIND_EXPRESSION_STATEMENT or not first_child.children or \
+           first_child.children[0].kind_id != self._KIND_STRING:
+            return None
+        node_bytes = self._get_node_bytes(first_child.children[0])
+        literal = node_bytes.lstrip(b'rRbBuUfF')
+        # As in Python, an f-string or bytes literal in docstring position is not a docstring (__doc__ is None).
+        prefix = node_bytes[:len(node_bytes) - len(literal)].lower()
+        if b'f' in prefix or b'b' in prefix:
+            return None
+        # Peel exactly one pair of delimiters so quotes inside the text (e.g. """say "hi"""") survive.
+        quote_length = 3 if literal[:3] in (b'"""', b"'''") else 1
+        return literal[quote_length:len(literal) - quote_length].decode('utf8')
+
+    def _visit_function_definition(self, node: Node, is_arrow: bool = False) -> Optional[FunctionInfo]:
         if is_arrow:
             # For arrow functions, node is variable_declarator; get arrow_function
             arrow_node = node.child_by_field_name('value')
-            if not arrow_node or arrow_node.type != 'arrow_function':
-                print(f"Error: Expected arrow_function node, got {arrow_node.type if arrow_node else 'None'}")
+            if not arrow_node or arrow_node.kind_id != self._KIND_ARROW_FUNCTION:
+                logger.error("Error: Expected arrow_function node, got %s", arrow_node.type if arrow_node else 'None')
                 return None
             name_node = node.child_by_field_name('name')
             parameters_node = arrow_node.child_by_field_name('parameters')
@@ -367,278 +710,458 @@ class CodeAnalyzer:
 
         if not name_node and not is_arrow:
             return None
-        func_name = self._get_node_text(name_node, source_code_bytes) if name_node else "anonymous"
+        func_name = self._get_identifier_text(name_node) if name_node else "anonymous"
         start_line = node.start_point[0] + 1
         end_line = body_node.end_point[0] + 1 if body_node else node.end_point[0] + 1
-        parameters = self._extract_parameters(arrow_node, source_code_bytes)
-        print(f"Parameters for function '{func_name}': {[p.name for p in parameters]}")
-        docstring = None
-        if self.language == 'python' and body_node and body_node.children:
-            first_child = body_node.children[0]
-            if first_child.type == 'expression_statement' and first_child.children and \
-               first_child.children[0].type == 'string':
-                docstring = self._get_node_text(first_child.children[0], source_code_bytes).strip('\"\'')
-        func_body_content = self._get_node_text(body_node, source_code_bytes) if body_node else None
+        parameters = self._extract_parameters(arrow_node)
+        docstring = self._extract_docstring(body_node)
+        body_range = (body_node.start_byte, body_node.end_byte) if body_node else None
         local_variables = []
         if body_node:
-            local_variables = self._extract_variables(body_node, source_code_bytes, is_function_local=True)
+            local_variables = self._extract_variables(body_node, is_function_local=True)
             param_names = {p.name for p in parameters}
             local_variables = [v for v in local_variables if v.name not in param_names]
         calls_made = []
         if body_node:
-            calls_made = self._extract_function_calls(body_node, source_code_bytes)
+            calls_made = self._extract_function_calls(body_node)
         func_info = FunctionInfo(
             name=func_name,
             start_line=start_line,
             end_line=end_line,
             parameters=parameters,
             docstring=docstring,
-            body=func_body_content,
+            body_range=body_range,
             variables=local_variables,
-            calls_made=calls_made
+            calls_made=calls_made,
+            source_code_bytes=self._src
         )
-        db_func_id = self.db_manager.insert_function(file_id, class_id, func_info)
-        if not db_func_id:
-            print(f"Error: Failed to insert function '{func_info.name}' into DB.")
-            return None
-        for param in func_info.parameters:
-            print(f"Inserting parameter for function '{func_name}': {param.name}, type={param.type_annotation}, default={param.default_value}")
-            self.db_manager.insert_parameter(db_func_id, param)
-        for var in func_info.variables:
-            self.db_manager.insert_variable(var, function_id=db_func_id)
-        for called_name in func_info.calls_made:
-            self.db_manager.insert_function_call(db_func_id, called_name, -1)
-        print(f"Code Analyzer: Inserted {'method' if class_id else 'top-level function'}: '{func_name}' with ID {db_func_id}.")
         return func_info
 
-    def _visit_class_definition(self, node: Node, source_code_bytes: bytes, file_id: int) -> Optional[ClassInfo]:
+    def _visit_class_definition(self, node: Node) -> Optional[ClassInfo]:
         name_node = node.child_by_field_name('name')
         body_node = node.child_by_field_name('body')
         if not name_node:
             return None
-        class_name = self._get_node_text(name_node, source_code_bytes)
+        class_name = self._get_identifier_text(name_node)
         start_line = name_node.start_point[0] + 1
         end_line = body_node.end_point[0] + 1 if body_node else name_node.end_point[0] + 1
-        docstring = None
-        if self.language == 'python' and body_node and body_node.children:
-            first_child = body_node.children[0]
-            if first_child.type == 'expression_statement' and first_child.children and \
-               first_child.children[0].type == 'string':
-                docstring = self._get_node_text(first_child.children[0], source_code_bytes).strip('\"\'')
-        class_body_content = self._get_node_text(body_node, source_code_bytes) if body_node else None
+        docstring = self._extract_docstring(body_node)
+        body_range = (body_node.start_byte, body_node.end_byte) if body_node else None
         class_attributes = []
         if body_node:
-            class_attributes = self._extract_variables(body_node, source_code_bytes, is_class_attribute=True)
+            class_attributes = self._extract_variables(body_node, is_class_attribute=True)
         current_class_info = ClassInfo(
             name=class_name,
             start_line=start_line,
             end_line=end_line,
             docstring=docstring,
-            body=class_body_content,
-            attributes=class_attributes
+            body_range=body_range,
+            attributes=class_attributes,
+            source_code_bytes=self._src
         )
-        db_class_id = self.db_manager.insert_class(file_id, current_class_info)
-        if not db_class_id:
-            print(f"Error: Failed to insert class '{current_class_info.name}' into DB.")
-            return None
-        for attr in current_class_info.attributes:
-            self.db_manager.insert_variable(attr, class_id=db_class_id)
         if body_node:
-            node_type = 'function_definition' if self.language == 'python' else 'method_definition'
+            method_kind = self._KIND_METHOD
             for child in body_node.children:
-                if child.type == node_type:
-                    method_info = self._visit_function_definition(child, source_code_bytes, file_id, db_class_id)
+                if child.kind_id == method_kind:
+                    method_info = self._visit_function_definition(child)
                     if method_info:
                         current_class_info.methods.append(method_info)
-        print(f"Code Analyzer: Inserted class: '{class_name}' with ID {db_class_id}.")
         return current_class_info
 
-    def analyze_code(self, code_string: str, file_path: str) -> Optional[AnalysisResults]:
-        print("Code Analyzer: Parsing code...")
+    def _cache_key(self, checksum: str) -> str:
+        """AnalysisCache content key: the content hash tagged with the cache format version and build.
+
+        Entries written in an older format, or by the other (pure-Python or mypyc) build, then miss in
+        has_cached_analysis too, so their files are sent to the worker pool instead of being rejected only
+        once they are loaded.
+        """
+        return f"{checksum}:v{self._CACHE_FORMAT_VERSION}:{_BUILD_FLAVOR}"
+
+    def _load_cached_analysis(self, file_path: str, checksum: str,
+                              source_code_bytes: bytes) -> Optional[AnalysisResults]:
+        """Return the cached analysis for this exact file content (`source_code_bytes`), or None on a miss."""
+        blob = self.db_manager.get_cached_analysis(file_path, self._cache_key(checksum))
+        if blob is None:
+            return None
+        # Anything short of a well-formed (version, AnalysisResults) pair is a miss, never an error:
+        # the file is then simply analyzed again and its cache row overwritten.
+        try:
+            payload = pickle.loads(blob)
+            if not (isinstance(payload, tuple) and len(payload) == 2
+                    and payload[0] == self._CACHE_FORMAT_VERSION and isinstance(payload[1], AnalysisResults)):
+                logger.info("Code Analyzer: Ignoring cached analysis for '%s' written in an older format.", file_path)
+                return None
+            cached_results: AnalysisResults = payload[1]
+            cached_results.attach_source(source_code_bytes)
+        except Exception as e:
+            logger.warning("Code Analyzer: Ignoring unreadable cached analysis for '%s': %s", file_path, e)
+            return None
+        return cached_results
+
+    def persist_results(self, analysis_results: AnalysisResults, file_id: int) -> bool:
+        """Persist the rows of an already computed analysis (cached, or from analyze_source) for a file record."""
+        if self.db_manager.ingest_definitions(file_id, analysis_results.top_level_variables,
+                                              analysis_results.functions, analysis_results.classes):
+            return True
+        logger.error("Error: Failed to insert the definitions of '%s' into DB.", analysis_results.file_path)
+        return False
+
+    def _walk_root(self, root_node: Node, file_path: str) -> AnalysisResults:
+        """Collects top-level variables, functions and classes under `root_node`. Must run inside `_binding`."""
+        analysis_results = AnalysisResults(file_path=file_path)
+        analysis_results.top_level_variables.extend(self._extract_variables(root_node, is_global=True))
+        for _, captures in self._toplevel_query.matches(root_node):
+            if 'error' in captures:
+                analysis_results.error_count += 1
+            elif 'class' in captures:
+                class_info = self._visit_class_definition(captures['class'][0])
+                if class_info:
+                    analysis_results.class_count += 1
+                    analysis_results.classes.append(class_info)
+            else:
+                is_arrow = 'arrow' in captures
+                func_info = self._visit_function_definition(captures['arrow' if is_arrow else 'function'][0],
+                                                            is_arrow=is_arrow)
+                if func_info:
+                    analysis_results.function_count += 1
+                    analysis_results.functions.append(func_info)
+        if analysis_results.error_count:
+            # Logged rather than printed: this runs in the analysis workers, whose stdout the parent doesn't own.
+            logger.warning("Code Analyzer: Skipped %d ERROR node(s) in '%s'.", analysis_results.error_count, file_path)
+        return analysis_results
+
+    def analyze_source(self, code_string: str, file_path: str, tree: Optional[Tree] = None) -> AnalysisResults:
+        """Analyzes a file without touching the DB and returns the full results.
+
+        Safe to run in a worker process; hand the results to `analyze_code(..., results=...)` in the
+        process that owns the DB connection.
+        """
         source_code_bytes = code_string.encode('utf8')
-        tree = self.parser.parse(source_code_bytes)
-        print(f"Code Analyzer: AST Root Node Type: {tree.root_node.type}")
-        print(f"Code Analyzer: AST Root Node Text (first 100 chars): {self._get_node_text(tree.root_node, source_code_bytes)[:100]}...")
-        checksum = hashlib.md5(source_code_bytes).hexdigest()
-        last_modified = datetime.datetime.now().isoformat()
+        if tree is None:
+            tree = self.parse(source_code_bytes)
+        with self._binding(source_code_bytes):
+            return self._walk_root(tree.root_node, file_path)
+
+    def has_cached_analysis(self, code_string: str, file_path: str) -> bool:
+        """Whether the analysis cache holds an entry for this exact file content."""
+        checksum = hashlib.blake2b(code_string.encode('utf8'), digest_size=16).hexdigest()
+        return self.db_manager.has_cached_analysis(file_path, self._cache_key(checksum))
+
+    def analyze_edit(self, file_path: str, new_code_string: str, edits: Optional[List[TextEdit]] = None,
+                     retain: bool = False) -> Optional[AnalysisResults]:
+        """Re-analyzes an edited file, reusing its previous tree so tree-sitter only reparses the edited regions.
+
+        Without `edits`, or when they don't fit the previously analyzed source (so they weren't computed
+        against it), the edit is derived by diffing against that source instead.
+        """
+        new_source_bytes = new_code_string.encode('utf8')
+        cached = self._tree_cache.get(file_path)
+        if cached is None or edits is None or not _edits_fit(edits, len(cached[1]), len(new_source_bytes)):
+            return self.analyze_code(new_code_string, file_path, retain=retain)
+        # Popped before the tree is edited in place, so a failing parse or analysis can't leave it cached.
+        old_tree = self._tree_cache.pop(file_path)[0]
+        for edit in edits:
+            old_tree.edit(
+                start_byte=edit.start_byte,
+                old_end_byte=edit.old_end_byte,
+                new_end_byte=edit.new_end_byte,
+                start_point=edit.start_point,
+                old_end_point=edit.old_end_point,
+                new_end_point=edit.new_end_point
+            )
+        new_tree = self._get_parser().parse(new_source_bytes, old_tree)
+        return self.analyze_code(new_code_string, file_path, tree=new_tree, retain=retain)
+
+    def analyze_code(self, code_string: str, file_path: str, tree: Optional[Tree] = None,
+                     analyzed_at: Optional[str] = None, retain: bool = False,
+                     results: Optional[AnalysisResults] = None) -> Optional[AnalysisResults]:
+        """Analyzes a file and stores the results. Pass `tree` to reuse a parse done on a worker thread.
+
+        `analyzed_at` is the ISO timestamp recorded for the file; batch callers pass one shared value,
+        otherwise it is taken only when the file actually has to be (re)inserted.
+
+        The file's definitions are collected while walking it and then written to the DB in one batch
+        (see SQLiteManager.ingest_definitions). By default the returned results only carry counts; pass `retain=True` to also get the full function/class/variable objects (this is
+        also what gets written to the analysis cache). A cache hit always returns the full results.
+
+        Pass `results` from `analyze_source` (e.g. computed in a worker process) to only persist them.
+        """
+        # Every row written for one file goes into a single transaction instead of committing per insert.
+        self.db_manager.begin()
+        try:
+            analysis_results = self._analyze_and_store(code_string, file_path, tree, analyzed_at, retain, results)
+        except Exception:
+            self.db_manager.rollback()
+            raise
+        if analysis_results is None:
+            self.db_manager.rollback()
+        else:
+            self.db_manager.commit()
+        return analysis_results
+
+    def _analyze_and_store(self, code_string: str, file_path: str, tree: Optional[Tree],
+                           analyzed_at: Optional[str], retain: bool,
+                           results: Optional[AnalysisResults]) -> Optional[AnalysisResults]:
+        source_code_bytes = code_string.encode('utf8')
+        checksum = hashlib.blake2b(source_code_bytes, digest_size=16).hexdigest()
         file_record = self.db_manager.get_file_by_path(file_path)
+        cached_results = self._load_cached_analysis(file_path, checksum, source_code_bytes) if results is None else None
+        if cached_results:
+            if file_record and file_record[3] == checksum:
+                logger.info("Code Analyzer: File '%s' unchanged since last analysis. Using cached results.", file_path)
+                return cached_results
+            if file_record:
+                self.db_manager.delete_file(file_record[0])
+            file_id = self.db_manager.insert_file(file_path, analyzed_at or datetime.datetime.now().isoformat(), checksum, code_string)
+            if not file_id:
+                logger.error("Error: Failed to insert file '%s' into DB.", file_path)
+                return None
+            logger.info("Code Analyzer: File '%s' inserted with ID %s from cached analysis.", file_path, file_id)
+            if not self.persist_results(cached_results, file_id):
+                return None
+            return cached_results
+        if results is None:
+            if tree is None:
+                logger.info("Code Analyzer: Parsing code...")
+                tree = self._reparse(file_path, source_code_bytes)
+            self._remember_tree(file_path, tree, source_code_bytes)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("AST Root Node Type: %s", tree.root_node.type)
+                logger.debug("AST Root Node Text (first 100 chars): %s...",
+                             source_code_bytes[tree.root_node.start_byte:tree.root_node.start_byte + 400].decode('utf8', errors='ignore')[:100])
         file_id = None
         if file_record:
             file_id = file_record[0]
             existing_checksum = file_record[3]
             if existing_checksum == checksum:
-                print(f"Code Analyzer: File '{file_path}' already in DB with ID {file_id}. Skipping re-insertion.")
+                logger.info("Code Analyzer: File '%s' already in DB with ID %s. Skipping re-insertion.", file_path, file_id)
             else:
-                print(f"Code Analyzer: File '{file_path}' exists but content changed. Re-analyzing.")
+                logger.info("Code Analyzer: File '%s' exists but content changed. Re-analyzing.", file_path)
+                self.db_manager.delete_file(file_id)
         if not file_id or (file_record and file_record[3] != checksum):
-            file_id = self.db_manager.insert_file(file_path, last_modified, checksum, code_string)
+            file_id = self.db_manager.insert_file(file_path, analyzed_at or datetime.datetime.now().isoformat(), checksum, code_string)
             if file_id:
-                print(f"Code Analyzer: File '{file_path}' inserted with ID {file_id}.")
+                logger.info("Code Analyzer: File '%s' inserted with ID %s.", file_path, file_id)
             else:
-                print(f"Error: Failed to insert file '{file_path}' into DB.")
+                logger.error("Error: Failed to insert file '%s' into DB.", file_path)
                 return None
-        analysis_results = AnalysisResults(file_path=file_path)
-        current_scope_variables = self._extract_variables(tree.root_node, source_code_bytes, is_global=True)
-        analysis_results.top_level_variables.extend(current_scope_variables)
-        for var in current_scope_variables:
-            self.db_manager.insert_variable(var, file_id=file_id)
-        cursor = tree.walk()
-        if cursor.goto_first_child():
-            while True:
-                node = cursor.node
-                if node.type == 'ERROR':
-                    print(f"Skipping ERROR node in analyze_code: {self._get_node_text(node, source_code_bytes)}")
-                    if not cursor.goto_next_sibling():
-                        break
-                    continue
-                if (self.language == 'python' and node.type == 'function_definition') or \
-                   (self.language == 'javascript' and node.type == 'function_declaration'):
-                    func_info = self._visit_function_definition(node, source_code_bytes, file_id)
-                    if func_info:
-                        analysis_results.functions.append(func_info)
-                elif self.language == 'javascript' and node.type == 'lexical_declaration':
-                    for declarator in node.named_children:
-                        if declarator.type == 'variable_declarator':
-                            value_node = declarator.child_by_field_name('value')
-                            if value_node and value_node.type == 'arrow_function':
-                                func_info = self._visit_function_definition(declarator, source_code_bytes, file_id, is_arrow=True)
-                                if func_info:
-                                    analysis_results.functions.append(func_info)
-                elif (self.language == 'python' and node.type == 'class_definition') or \
-                     (self.language == 'javascript' and node.type == 'class_declaration'):
-                    class_info = self._visit_class_definition(node, source_code_bytes, file_id)
-                    if class_info:
-                        analysis_results.classes.append(class_info)
-                if not cursor.goto_next_sibling():
-                    break
-        print("Code Analyzer: Code analysis complete.")
+        if results is not None:
+            analysis_results = results
+        else:
+            with self._binding(source_code_bytes):
+                analysis_results = self._walk_root(cast(Tree, tree).root_node, file_path)
+        if not self.persist_results(analysis_results, file_id):
+            return None
+        if retain or results is not None:
+            # The source is already in Files.full_content, so it is left out of the blob and reattached on load.
+            analysis_results.attach_source(None)
+            blob = pickle.dumps((self._CACHE_FORMAT_VERSION, analysis_results))
+            analysis_results.attach_source(source_code_bytes)
+            self.db_manager.upsert_cached_analysis(file_path, self._cache_key(checksum), blob)
+        else:
+            # The definitions are in the DB now; without retain only the counts are handed back.
+            analysis_results.top_level_variables = []
+            analysis_results.functions = []
+            analysis_results.classes = []
+        logger.info("Code Analyzer: Code analysis complete.")
         return analysis_results
 
-if __name__ == "__main__":
-    import datetime
-    class MockDbManager:
-        def __init__(self):
-            self.files = {}
-            self.functions = {}
-            self.classes = {}
-            self.parameters = {}
-            self.variables = {}
-            self.function_calls = {}
-            self._next_file_id = 1
-            self._next_func_id = 1
-            self._next_class_id = 1
-            self._next_param_id = 1
-            self._next_var_id = 1
-            self._next_call_id = 1
-        def connect(self):
-            print("Mock DB: Connected.")
-        def close(self):
-            print("Mock DB: Closed.")
-        def drop_tables(self):
-            print("Mock DB: Tables dropped (mock).")
-            self.__init__()
-        def create_tables(self):
-            print("Mock DB: Tables created (mock).")
-        def insert_file(self, path: str, last_modified_at: str, checksum: str, full_content: str) -> Optional[int]:
-            for file_id, file_data in self.files.items():
-                if file_data['path'] == path:
-                    print(f"Mock DB: File '{path}' already exists, returning ID {file_id}.")
-                    return file_id
-            file_id = self._next_file_id
-            self.files[file_id] = {'id': file_id, 'path': path, 'last_modified_at': last_modified_at, 'checksum': checksum, 'full_content': full_content}
-            self._next_file_id += 1
-            print(f"Mock DB: Inserted file '{path}' with ID {file_id}.")
+# In-memory stand-in for SQLiteManager used by the self-test below. Kept at module level so the
+# module stays compilable with mypyc, which does not support class definitions nested in blocks.
+class MockDbManager:
+    def __init__(self) -> None:
+        self.files: Dict[int, Dict[str, Any]] = {}
+        self.functions: Dict[int, Dict[str, Any]] = {}
+        self.classes: Dict[int, Dict[str, Any]] = {}
+        self.parameters: Dict[int, Dict[str, Any]] = {}
+        self.variables: Dict[int, Dict[str, Any]] = {}
+        self.function_calls: Dict[int, Dict[str, Any]] = {}
+        self._next_file_id = 1
+        self._next_func_id = 1
+        self._next_class_id = 1
+        self._next_param_id = 1
+        self._next_var_id = 1
+        self._next_call_id = 1
+        # Secondary indexes so lookups touch one bucket instead of scanning every row.
+        self._file_by_path: Dict[str, int] = {}
+        self._func_by_key: Dict[Tuple[int, Optional[int], str], int] = {}
+        self._class_by_key: Dict[Tuple[int, str], int] = {}
+        self._funcs_by_file: Dict[int, List[int]] = {}
+        self._methods_by_class: Dict[int, List[int]] = {}
+        self._classes_by_file: Dict[int, List[int]] = {}
+        self._params_by_function: Dict[int, List[int]] = {}
+        self._vars_by_file: Dict[int, List[int]] = {}
+        self._vars_by_class: Dict[int, List[int]] = {}
+        self._vars_by_function: Dict[int, List[int]] = {}
+        self._calls_by_function: Dict[int, List[int]] = {}
+    def connect(self):
+        print("Mock DB: Connected.")
+    def close(self):
+        print("Mock DB: Closed.")
+    def drop_tables(self):
+        print("Mock DB: Tables dropped (mock).")
+        self.__init__()
+    def create_tables(self):
+        print("Mock DB: Tables created (mock).")
+    def insert_file(self, path: str, last_modified_at: str, checksum: str, full_content: str) -> Optional[int]:
+        if path in self._file_by_path:
+            file_id = self._file_by_path[path]
+            print(f"Mock DB: File '{path}' already exists, returning ID {file_id}.")
             return file_id
-        def get_file_by_path(self, path: str) -> Optional[tuple]:
-            for file_id, file_data in self.files.items():
-                if file_data['path'] == path:
-                    return (file_data['id'], file_data['path'], file_data['last_modified_at'], file_data['checksum'], file_data['full_content'])
+        file_id = self._next_file_id
+        self.files[file_id] = {'id': file_id, 'path': path, 'last_modified_at': last_modified_at, 'checksum': checksum, 'full_content': full_content}
+        self._file_by_path[path] = file_id
+        self._next_file_id += 1
+        print(f"Mock DB: Inserted file '{path}' with ID {file_id}.")
+        return file_id
+    def get_file_by_path(self, path: str) -> Optional[tuple]:
+        file_id = self._file_by_path.get(path)
+        if file_id is None:
             return None
-        def insert_function(self, file_id: int, class_id: Optional[int], func_info: FunctionInfo) -> Optional[int]:
-            for func_db_id, func_data in self.functions.items():
-                if func_data['file_id'] == file_id and func_data['class_id'] == class_id and func_data['name'] == func_info.name:
-                    print(f"Mock DB: Function '{func_info.name}' already exists for file ID {file_id}. ID: {func_db_id}")
-                    return func_db_id
-            func_id = self._next_func_id
-            self.functions[func_id] = {'id': func_id, 'file_id': file_id, 'class_id': class_id, 'name': func_info.name,
-                                       'start_line': func_info.start_line, 'end_line': func_info.end_line,
-                                       'docstring': func_info.docstring, 'body': func_info.body, 'signature': func_info.name + '()'}
-            self._next_func_id += 1
-            print(f"Mock DB: Inserted function '{func_info.name}' with ID {func_id}.")
-            return func_id
-        def insert_class(self, file_id: int, class_info: ClassInfo) -> Optional[int]:
-            for class_db_id, class_data in self.classes.items():
-                if class_data['file_id'] == file_id and class_data['name'] == class_info.name:
-                    print(f"Mock DB: Class '{class_info.name}' already exists for file ID {file_id}. ID: {class_db_id}")
-                    return class_db_id
-            class_id = self._next_class_id
-            self.classes[class_id] = {'id': class_id, 'file_id': file_id, 'name': class_info.name,
-                                      'start_line': class_info.start_line, 'end_line': class_info.end_line,
-                                      'docstring': class_info.docstring, 'body': class_info.body}
-            self._next_class_id += 1
-            print(f"Mock DB: Inserted class '{class_info.name}' with ID {class_id}.")
-            return class_id
-        def insert_parameter(self, function_id: int, param_info: ParameterInfo) -> Optional[int]:
-            print(f"Mock DB: Inserting parameter '{param_info.name}' for func ID {function_id}, type={param_info.type_annotation}, default={param_info.default_value}")
-            param_id = self._next_param_id
-            self.parameters[param_id] = {'id': param_id, 'function_id': function_id, 'name': param_info.name,
-                                         'type_annotation': param_info.type_annotation, 'default_value': param_info.default_value}
-            self._next_param_id += 1
-            print(f"Mock DB: Inserted parameter '{param_info.name}' for func ID {function_id}.")
-            return param_id
-        def insert_variable(self, var_info: VariableInfo, file_id: Optional[int] = None,
-                            class_id: Optional[int] = None, function_id: Optional[int] = None) -> Optional[int]:
-            var_id = self._next_var_id
-            self.variables[var_id] = {'id': var_id, 'file_id': file_id, 'class_id': class_id, 'function_id': function_id,
-                                      'name': var_info.name, 'value': var_info.value, 'type_annotation': var_info.type_annotation,
-                                      'is_global': var_info.is_global, 'is_class_attribute': var_info.is_class_attribute,
-                                      'is_function_local': var_info.is_function_local, 'defined_at_line': var_info.defined_at_line}
-            self._next_var_id += 1
-            print(f"Mock DB: Inserted variable '{var_info.name}'.")
-            return var_id
-        def insert_function_call(self, calling_function_id: int, called_name: str, call_line_number: int) -> Optional[int]:
-            call_id = self._next_call_id
-            self.function_calls[call_id] = {'id': call_id, 'calling_function_id': calling_function_id,
-                                            'called_name': called_name, 'call_line_number': call_line_number}
-            self._next_call_id += 1
-            print(f"Mock DB: Inserted call '{called_name}' from func ID {calling_function_id}.")
-            return call_id
-        def get_functions_by_file_id(self, file_id: int) -> List[tuple]:
-            return [(v['id'], v['file_id'], v['class_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'], v['signature'])
-                    for v in self.functions.values() if v['file_id'] == file_id and v['class_id'] is None]
-        def get_classes_by_file_id(self, file_id: int) -> List[tuple]:
-            return [(v['id'], v['file_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'])
-                    for v in self.classes.values() if v['file_id'] == file_id]
-        def get_methods_by_class_id(self, class_id: int) -> List[tuple]:
-            return [(v['id'], v['file_id'], v['class_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'], v['signature'])
-                    for v in self.functions.values() if v['class_id'] == class_id]
-        def get_parameters_by_function_id(self, function_id: int) -> List[tuple]:
-            print(f"Mock DB: Retrieving parameters for function_id: {function_id}")
-            return [(v['id'], v['function_id'], v['name'], v['type_annotation'], v['default_value'])
-                    for v in self.parameters.values() if v['function_id'] == function_id]
-        def get_variables_by_scope(self, file_id: Optional[int] = None, class_id: Optional[int] = None, function_id: Optional[int] = None) -> List[tuple]:
-            results = []
-            for v in self.variables.values():
-                if file_id is not None and v['file_id'] == file_id and v['class_id'] is None and v['function_id'] is None:
-                    results.append((v['id'], v['file_id'], v['class_id'], v['function_id'],
-                                    v['name'], v['value'], v['type_annotation'], v['is_global'],
-                                    v['is_class_attribute'], v['is_function_local'], v['defined_at_line'], None))
-                elif class_id is not None and v['class_id'] == class_id and v['function_id'] is None:
-                    results.append((v['id'], v['file_id'], v['class_id'], v['function_id'],
-                                    v['name'], v['value'], v['type_annotation'], v['is_global'],
-                                    v['is_class_attribute'], v['is_function_local'], v['defined_at_line'], None))
-                elif function_id is not None and v['function_id'] == function_id:
-                    results.append((v['id'], v['file_id'], v['class_id'], v['function_id'],
-                                    v['name'], v['value'], v['type_annotation'], v['is_global'],
-                                    v['is_class_attribute'], v['is_function_local'], v['defined_at_line'], None))
-            return results
-        def get_function_calls_by_calling_function_id(self, calling_function_id: int) -> List[tuple]:
-            return [(v['id'], v['calling_function_id'], v['called_name'], v['call_line_number'])
-                    for v in self.function_calls.values() if v['calling_function_id'] == calling_function_id]
-        def get_all_files(self) -> List[tuple]:
-            return [(v['id'], v['path'], v['last_modified_at'], v['checksum'], v['full_content'])
-                    for v in self.files.values()]
+        file_data = self.files[file_id]
+        return (file_data['id'], file_data['path'], file_data['last_modified_at'], file_data['checksum'], file_data['full_content'])
+    def insert_function(self, file_id: int, class_id: Optional[int], func_info: FunctionInfo) -> Optional[int]:
+        key = (file_id, class_id, func_info.name)
+        if key in self._func_by_key:
+            func_db_id = self._func_by_key[key]
+            logger.debug("Mock DB: Function '%s' already exists for file ID %s. ID: %s", func_info.name, file_id, func_db_id)
+            return func_db_id
+        func_id = self._next_func_id
+        self.functions[func_id] = {'id': func_id, 'file_id': file_id, 'class_id': class_id, 'name': func_info.name,
+                                   'start_line': func_info.start_line, 'end_line': func_info.end_line,
+                                   'docstring': func_info.docstring, 'body': func_info.body, 'signature': func_info.name + '()'}
+        self._func_by_key[key] = func_id
+        if class_id is None:
+            self._funcs_by_file.setdefault(file_id, []).append(func_id)
+        else:
+            self._methods_by_class.setdefault(class_id, []).append(func_id)
+        self._next_func_id += 1
+        logger.debug("Mock DB: Inserted function '%s' with ID %s.", func_info.name, func_id)
+        return func_id
+    def insert_class(self, file_id: int, class_info: ClassInfo) -> Optional[int]:
+        key = (file_id, class_info.name)
+        if key in self._class_by_key:
+            class_db_id = self._class_by_key[key]
+            logger.debug("Mock DB: Class '%s' already exists for file ID %s. ID: %s", class_info.name, file_id, class_db_id)
+            return class_db_id
+        class_id = self._next_class_id
+        self.classes[class_id] = {'id': class_id, 'file_id': file_id, 'name': class_info.name,
+                                  'start_line': class_info.start_line, 'end_line': class_info.end_line,
+                                  'docstring': class_info.docstring, 'body': class_info.body}
+        self._class_by_key[key] = class_id
+        self._classes_by_file.setdefault(file_id, []).append(class_id)
+        self._next_class_id += 1
+        logger.debug("Mock DB: Inserted class '%s' with ID %s.", class_info.name, class_id)
+        return class_id
+    def insert_parameter(self, function_id: int, param_info: ParameterInfo) -> Optional[int]:
+        param_id = self._next_param_id
+        self.parameters[param_id] = {'id': param_id, 'function_id': function_id, 'name': param_info.name,
+                                     'type_annotation': param_info.type_annotation, 'default_value': param_info.default_value}
+        self._params_by_function.setdefault(function_id, []).append(param_id)
+        self._next_param_id += 1
+        logger.debug("Mock DB: Inserted parameter '%s' for func ID %s, type=%s, default=%s.",
+                     param_info.name, function_id, param_info.type_annotation, param_info.default_value)
+        return param_id
+    def insert_variable(self, var_info: VariableInfo, file_id: Optional[int] = None,
+                        class_id: Optional[int] = None, function_id: Optional[int] = None) -> Optional[int]:
+        var_id = self._next_var_id
+        self.variables[var_id] = {'id': var_id, 'file_id': file_id, 'class_id': class_id, 'function_id': function_id,
+                                  'name': var_info.name, 'value': var_info.value, 'type_annotation': var_info.type_annotation,
+                                  'is_global': var_info.is_global, 'is_class_attribute': var_info.is_class_attribute,
+                                  'is_function_local': var_info.is_function_local, 'defined_at_line': var_info.defined_at_line}
+        if file_id is not None:
+            self._vars_by_file.setdefault(file_id, []).append(var_id)
+        if class_id is not None:
+            self._vars_by_class.setdefault(class_id, []).append(var_id)
+        if function_id is not None:
+            self._vars_by_function.setdefault(function_id, []).append(var_id)
+        self._next_var_id += 1
+        logger.debug("Mock DB: Inserted variable '%s'.", var_info.name)
+        return var_id
+    def insert_function_call(self, calling_function_id: int, called_name: str, call_line_number: int) -> Optional[int]:
+        call_id = self._next_call_id
+        self.function_calls[call_id] = {'id': call_id, 'calling_function_id': calling_function_id,
+                                        'called_name': called_name, 'call_line_number': call_line_number}
+        self._calls_by_function.setdefault(calling_function_id, []).append(call_id)
+        self._next_call_id += 1
+        logger.debug("Mock DB: Inserted call '%s' from func ID %s.", called_name, calling_function_id)
+        return call_id
+    def ingest_definitions(self, file_id: int, top_level_variables: List[VariableInfo],
+                           functions: List[FunctionInfo], classes: List[ClassInfo]) -> bool:
+        for var_info in top_level_variables:
+            self.insert_variable(var_info, file_id=file_id)
+        scoped_functions: List[Tuple[Optional[int], FunctionInfo]] = [(None, func_info) for func_info in functions]
+        for class_info in classes:
+            class_id = self.insert_class(file_id, class_info)
+            for var_info in class_info.attributes:
+                self.insert_variable(var_info, class_id=class_id)
+            scoped_functions.extend((class_id, method_info) for method_info in class_info.methods)
+        for class_id, func_info in scoped_functions:
+            func_id = cast(int, self.insert_function(file_id, class_id, func_info))
+            for param_info in func_info.parameters:
+                self.insert_parameter(func_id, param_info)
+            for var_info in func_info.variables:
+                self.insert_variable(var_info, function_id=func_id)
+            for called_name in func_info.calls_made:
+                self.insert_function_call(func_id, called_name, -1)
+        return True
+    def begin(self) -> bool:
+        return True
+    def commit(self) -> bool:
+        return True
+    def rollback(self) -> bool:
+        return True
+    def delete_file(self, file_id: int) -> bool:
+        file_data = self.files.pop(file_id, None)
+        if file_data:
+            self._file_by_path.pop(file_data['path'], None)
+        return True
+    def get_cached_analysis(self, path: str, content_hash: str) -> Optional[bytes]:
+        return None
+    def has_cached_analysis(self, path: str, content_hash: str) -> bool:
+        return False
+    def upsert_cached_analysis(self, path: str, content_hash: str, analysis: bytes) -> bool:
+        return True
+    def get_functions_by_file_id(self, file_id: int) -> List[tuple]:
+        return [(v['id'], v['file_id'], v['class_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'], v['signature'])
+                for v in (self.functions[i] for i in self._funcs_by_file.get(file_id, []))]
+    def get_classes_by_file_id(self, file_id: int) -> List[tuple]:
+        return [(v['id'], v['file_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'])
+                for v in (self.classes[i] for i in self._classes_by_file.get(file_id, []))]
+    def get_methods_by_class_id(self, class_id: int) -> List[tuple]:
+        return [(v['id'], v['file_id'], v['class_id'], v['name'], v['start_line'], v['end_line'], v['docstring'], v['body'], v['signature'])
+                for v in (self.functions[i] for i in self._methods_by_class.get(class_id, []))]
+    def get_parameters_by_function_id(self, function_id: int) -> List[tuple]:
+        logger.debug("Mock DB: Retrieving parameters for function_id: %s", function_id)
+        return [(v['id'], v['function_id'], v['name'], v['type_annotation'], v['default_value'])
+                for v in (self.parameters[i] for i in self._params_by_function.get(function_id, []))]
+    def get_variables_by_scope(self, file_id: Optional[int] = None, class_id: Optional[int] = None, function_id: Optional[int] = None) -> List[tuple]:
+        var_ids: set[int] = set()
+        if file_id is not None:
+            var_ids.update(i for i in self._vars_by_file.get(file_id, [])
+                           if self.variables[i]['class_id'] is None and self.variables[i]['function_id'] is None)
+        if class_id is not None:
+            var_ids.update(i for i in self._vars_by_class.get(class_id, []) if self.variables[i]['function_id'] is None)
+        if function_id is not None:
+            var_ids.update(self._vars_by_function.get(function_id, []))
+        results = []
+        for var_id in sorted(var_ids):
+            v = self.variables[var_id]
+            results.append((v['id'], v['file_id'], v['class_id'], v['function_id'],
+                            v['name'], v['value'], v['type_annotation'], v['is_global'],
+                            v['is_class_attribute'], v['is_function_local'], v['defined_at_line'], None))
+        return results
+    def get_function_calls_by_calling_function_id(self, calling_function_id: int) -> List[tuple]:
+        return [(v['id'], v['calling_function_id'], v['called_name'], v['call_line_number'])
+                for v in (self.function_calls[i] for i in self._calls_by_function.get(calling_function_id, []))]
+    def get_all_files(self) -> List[tuple]:
+        return [(v['id'], v['path'], v['last_modified_at'], v['checksum'], v['full_content'])
+                for v in self.files.values()]
+
 
+if __name__ == "__main__":
+    import datetime
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("Starting CodeAnalyzer module test...")
     mock_db = MockDbManager()
     code_analyzer = CodeAnalyzer(language_name="python", db_manager=mock_db)
@@ -670,87 +1193,76 @@ def another_function(val):
     print(f"Inside another_function with {val}")
     return val * 10
     """
-    analysis_results = code_analyzer.analyze_code(sample_code, file_path="/mock/path/to/sample.py")
+    analysis_results = code_analyzer.analyze_code(sample_code, file_path="/mock/path/to/sample.py", retain=True)
     if analysis_results:
-        print("\n--- Code Analyzer Test Analysis Summary ---")
-        print(f"File Path: {analysis_results.file_path}")
-        print(f"Top-Level Variables: {[v.name for v in analysis_results.top_level_variables]}")
-        print(f"Functions Found: {[f.name for f in analysis_results.functions]}")
-        print(f"Classes Found: {[c.name for c in analysis_results.classes]}")
-        print("\nDetailed Functions:")
+        # The report is assembled first and written with a single print instead of one per line.
+        report: List[str] = []
+        emit = report.append
+
+        def format_parameter(param: ParameterInfo, indent: str) -> str:
+            type_part = f": {param.type_annotation}" if param.type_annotation else ""
+            default_part = f" = {param.default_value}" if param.default_value else ""
+            return f"{indent}- {param.name}{type_part}{default_part}"
+
+        def format_variable(var: VariableInfo, indent: str) -> str:
+            type_part = f": {var.type_annotation}" if var.type_annotation else ""
+            value_part = f" = {var.value}" if var.value else ""
+            return f"{indent}- {var.name}{type_part}{value_part} (Line: {var.defined_at_line})"
+
+        emit("\n--- Code Analyzer Test Analysis Summary ---")
+        emit(f"File Path: {analysis_results.file_path}")
+        emit(f"Top-Level Variables: {[v.name for v in analysis_results.top_level_variables]}")
+        emit(f"Functions Found: {[f.name for f in analysis_results.functions]}")
+        emit(f"Classes Found: {[c.name for c in analysis_results.classes]}")
+        emit("\nDetailed Functions:")
         for func in analysis_results.functions:
-            print(f"  - Function: {func.name} (Lines {func.start_line}-{func.end_line})")
+            emit(f"  - Function: {func.name} (Lines {func.start_line}-{func.end_line})")
             if func.docstring:
-                print(f"    Docstring: {func.docstring[:50]}...")
+                emit(f"    Docstring: {func.docstring[:50]}...")
             if func.parameters:
-                print("    Parameters:")
+                emit("    Parameters:")
                 for param in func.parameters:
-                    param_details = f"      - {param.name}"
-                    if param.type_annotation:
-                        param_details += f": {param.type_annotation}"
-                    if param.default_value:
-                        param_details += f" = {param.default_value}"
-                    print(param_details)
-            if func.body:
-                print(f"    Body (first 50 chars): '{func.body[:50]}...'")
+                    emit(format_parameter(param, "      "))
+            body_preview = func.get_body_preview(50)
+            if body_preview:
+                emit(f"    Body (first 50 chars): '{body_preview}...'")
             if func.variables:
-                print("    Local Variables:")
+                emit("    Local Variables:")
                 for var in func.variables:
-                    details = f"      - {var.name}"
-                    if var.type_annotation:
-                        details += f": {var.type_annotation}"
-                    if var.value:
-                        details += f" = {var.value}"
-                    details += f" (Line: {var.defined_at_line})"
-                    print(details)
+                    emit(format_variable(var, "      "))
             if func.calls_made:
-                print("    Calls Made:")
+                emit("    Calls Made:")
                 for call_name in func.calls_made:
-                    print(f"      - {call_name}")
-        print("\nDetailed Classes:")
+                    emit(f"      - {call_name}")
+        emit("\nDetailed Classes:")
         for cls in analysis_results.classes:
-            print(f"  - Class: {cls.name} (Lines {cls.start_line}-{cls.end_line})")
+            emit(f"  - Class: {cls.name} (Lines {cls.start_line}-{cls.end_line})")
             if cls.docstring:
-                print(f"    Docstring: {cls.docstring[:50]}...")
+                emit(f"    Docstring: {cls.docstring[:50]}...")
             if cls.attributes:
-                print("    Class Attributes:")
+                emit("    Class Attributes:")
                 for attr in cls.attributes:
-                    details = f"      - {attr.name}"
-                    if attr.type_annotation:
-                        details += f": {attr.type_annotation}"
-                    if attr.value:
-                        details += f" = {attr.value}"
-                    details += f" (Line: {attr.defined_at_line})"
-                    print(details)
+                    emit(format_variable(attr, "      "))
             if cls.methods:
-                print("    Methods:")
+                emit("    Methods:")
                 for method in cls.methods:
-                    print(f"      - Method: {method.name} (Lines {method.start_line}-{method.end_line})")
+                    emit(f"      - Method: {method.name} (Lines {method.start_line}-{method.end_line})")
                     if method.docstring:
-                        print(f"        Docstring: {method.docstring[:50]}...")
+                        emit(f"        Docstring: {method.docstring[:50]}...")
                     if method.parameters:
-                        print("        Parameters:")
+                        emit("        Parameters:")
                         for param in method.parameters:
-                            param_details = f"          - {param.name}"
-                            if param.type_annotation:
-                                param_details += f": {param.type_annotation}"
-                            if param.default_value:
-                                param_details += f" = {param.default_value}"
-                            print(param_details)
-                    if method.body:
-                        print(f"        Body (first 50 chars): '{method.body[:50]}...'")
+                            emit(format_parameter(param, "          "))
+                    body_preview = method.get_body_preview(50)
+                    if body_preview:
+                        emit(f"        Body (first 50 chars): '{body_preview}...'")
                     if method.variables:
-                        print("        Local Variables:")
+                        emit("        Local Variables:")
                         for var in method.variables:
-                            details = f"          - {var.name}"
-                            if var.type_annotation:
-                                details += f": {var.type_annotation}"
-                            if var.value:
-                                details += f" = {var.value}"
-                            details += f" (Line: {var.defined_at_line})"
-                            print(details)
+                            emit(format_variable(var, "          "))
                     if method.calls_made:
-                        print("        Calls Made:")
+                        emit("        Calls Made:")
                         for call_name in method.calls_made:
-                            print(f"          - {call_name}")
+                            emit(f"          - {call_name}")
+        print("\n".join(report))
     print("\nCode Analyzer module test complete.")
\ No newline at end of file
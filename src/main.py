@@ -2,21 +2,61 @@ import os
 import sys
 import argparse
 import json
-import glob
 import datetime
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
 from typing import List, Optional
 from .database.sqlite_manager import SQLiteManager
 
+try:
+    import orjson
+except ImportError:  # Optional: save_to_json falls back to the stdlib encoder.
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# This file's directory (src/) and the project's data directory, resolved once per process.
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+_DATA_DIR = os.path.join(os.path.dirname(_SRC_DIR), 'data')
+
+# (language, analyzer file extension) for each supported source file extension.
+_EXTENSION_LANGUAGES = {
+    ".py": ("python", "py"),
+    ".ts": ("javascript", "ts"),
+    ".tsx": ("javascript", "ts"),
+    ".js": ("javascript", "js"),
+    ".jsx": ("javascript", "js"),
+}
+
+# Source extensions collected from --directory for each --languages entry; TypeScript and JavaScript
+# share a grammar family, so either one picks up both sets of files.
+_LANGUAGE_EXTENSIONS = {
+    "python": (".py",),
+    "typescript": (".ts", ".tsx", ".js", ".jsx"),
+    "javascript": (".ts", ".tsx", ".js", ".jsx"),
+}
+
+def parse_languages(value: str) -> frozenset:
+    """argparse type for --languages: the comma-separated names, stripped and lower-cased."""
+    return frozenset(language.strip().lower() for language in value.split(","))
+
 def get_file_extension_and_language(file_path: str) -> tuple[str, str]:
     """Determine the language and file extension for a given file path."""
-    extension = os.path.splitext(file_path)[1].lower()
-    if extension == ".py":
-        return "python", "py"
-    elif extension in [".ts", ".tsx"]:
-        return "javascript", "ts"
-    elif extension in [".js", ".jsx"]:
-        return "javascript", "js"
-    return None, ""
+    return _EXTENSION_LANGUAGES.get(os.path.splitext(file_path)[1].lower(), (None, ""))
+
+# Per-process analyzers (and with them their tree-sitter parsers), reused across files, per language.
+_analyzers = {}
+
+def get_analyzer(language: str, file_extension: str, db_manager: Optional[SQLiteManager]) -> 'CodeAnalyzer':
+    """Return the process's analyzer for a language, building it (and its parser) only once."""
+    key = (language, file_extension)
+    analyzer = _analyzers.get(key)
+    if analyzer is None or analyzer.db_manager is not db_manager:
+        # Imported only when an analyzer is built, so the per-file lookups run no import statement.
+        from .code_analyzer import CodeAnalyzer
+        analyzer = CodeAnalyzer(language_name=language, db_manager=db_manager, file_extension=file_extension)
+        _analyzers[key] = analyzer
+    return analyzer
 
 def analyze_file(file_path: str, db_manager: SQLiteManager) -> Optional['AnalysisResults']:
     """Analyze a single file and return the analysis results."""
@@ -25,69 +65,141 @@ def analyze_file(file_path: str, db_manager: SQLiteManager) -> Optional['Analysi
         print(f"Skipping unsupported file: {file_path}")
         return None
     try:
-        from .code_analyzer import CodeAnalyzer, AnalysisResults
         with open(file_path, encoding="utf-8") as file:
             code = file.read()
-        analyzer = CodeAnalyzer(language_name=language, db_manager=db_manager, file_extension=file_extension)
-        return analyzer.analyze_code(code, file_path)
+        return get_analyzer(language, file_extension, db_manager).analyze_code(code, file_path, retain=True)
     except ImportError as e:
         print(f"Import error for code_analyzer: {e}")
-        print(f"Ensure 'code_analyzer.py' exists in {os.path.dirname(__file__)} and dependencies are installed.")
+        print(f"Ensure 'code_analyzer.py' exists in {_SRC_DIR} and dependencies are installed.")
         return None
     except Exception as e:
         print(f"Error analyzing {file_path}: {e}")
         return None
 
+def _init_worker(language_keys: List[tuple]):
+    """Worker initializer: build each needed analyzer and its parser once for the worker's lifetime."""
+    for language, file_extension in language_keys:
+        get_analyzer(language, file_extension, None)
+
+def _analyze_in_worker(language: str, file_extension: str, code: str, file_path: str) -> 'AnalysisResults':
+    """Analyze one file in a worker process, without DB access."""
+    return get_analyzer(language, file_extension, None).analyze_source(code, file_path)
+
+def analyze_files(file_paths: List[str], db_manager: SQLiteManager) -> List['AnalysisResults']:
+    """Analyze several files, parsing and walking them in parallel worker processes.
+
+    Workers only compute the analysis; the results are persisted here, in file order, by the
+    process that owns the SQLite connection. Files with a cached analysis skip the workers.
+    """
+    try:
+        from .code_analyzer import CodeAnalyzer
+    except ImportError as e:
+        print(f"Import error for code_analyzer: {e}")
+        print(f"Ensure 'code_analyzer.py' exists in {_SRC_DIR} and dependencies are installed.")
+        return []
+    jobs = []
+    for file_path in file_paths:
+        language, file_extension = get_file_extension_and_language(file_path)
+        if not language:
+            print(f"Skipping unsupported file: {file_path}")
+            continue
+        try:
+            with open(file_path, encoding="utf-8") as file:
+                code = file.read()
+        except Exception as e:
+            print(f"Error analyzing {file_path}: {e}")
+            continue
+        jobs.append((file_path, code, (language, file_extension)))
+
+    analysis_results_list = []
+    # One timestamp for the whole batch instead of formatting the clock once per file.
+    analyzed_at = datetime.datetime.now().isoformat()
+    analyzers = {key: get_analyzer(key[0], key[1], db_manager) for _, _, key in jobs}
+    # Files with a usable cached analysis are only persisted here; the rest still need parsing.
+    pending = [index for index, (file_path, code, key) in enumerate(jobs)
+               if not analyzers[key].has_cached_analysis(code, file_path)]
+    futures: List[Optional[Future]] = [None] * len(jobs)
+    executor = None
+    if len(pending) > 1:
+        # At most one worker per pending file. A single miss is parsed here by analyze_code instead,
+        # which is cheaper than starting a pool.
+        executor = ProcessPoolExecutor(max_workers=min(len(pending), os.cpu_count() or 1),
+                                       initializer=_init_worker,
+                                       initargs=(sorted({jobs[index][2] for index in pending}),))
+        for index in pending:
+            file_path, code, key = jobs[index]
+            futures[index] = executor.submit(_analyze_in_worker, key[0], key[1], code, file_path)
+    try:
+        for (file_path, code, key), future in zip(jobs, futures):
+            print(f"Processing file: {file_path}...")
+            try:
+                results = future.result() if future else None
+                analysis_results = analyzers[key].analyze_code(code, file_path, analyzed_at=analyzed_at,
+                                                               retain=True, results=results)
+            except Exception as e:
+                print(f"Error analyzing {file_path}: {e}")
+                continue
+            if analysis_results:
+                analysis_results_list.append(analysis_results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return analysis_results_list
+
 def print_analysis_summary(analysis_results: 'AnalysisResults'):
     """Print the analysis summary for a file."""
-    print(f"\n--- Analysis Summary for {analysis_results.file_path} ---")
-    print(f"Module Docstring: {analysis_results.module_docstring or 'N/A'}")
-    print(f"Top-Level Variables: {[variable.name for variable in analysis_results.top_level_variables]}")
-    print(f"Functions Found: {[function.name for function in analysis_results.functions]}")
-    print(f"Classes Found: {[class_.name for class_ in analysis_results.classes]}")
-    print("\nDetailed Functions:")
+    # Build the report first and write it once rather than a print per line.
+    report: List[str] = []
+    emit = report.append
+    emit(f"\n--- Analysis Summary for {analysis_results.file_path} ---")
+    emit(f"Module Docstring: {analysis_results.module_docstring or 'N/A'}")
+    emit(f"Top-Level Variables: {[variable.name for variable in analysis_results.top_level_variables]}")
+    emit(f"Functions Found: {[function.name for function in analysis_results.functions]}")
+    emit(f"Classes Found: {[class_.name for class_ in analysis_results.classes]}")
+    emit("\nDetailed Functions:")
     for function in analysis_results.functions:
-        print(f"  - Function: {function.name} (Lines {function.start_line}-{function.end_line})")
+        emit(f"  - Function: {function.name} (Lines {function.start_line}-{function.end_line})")
         if function.docstring:
-            print(f"    Docstring: {function.docstring[:50]}...")
+            emit(f"    Docstring: {function.docstring[:50]}...")
         if function.parameters:
-            print("    Parameters:")
+            emit("    Parameters:")
             for parameter in function.parameters:
                 parameter_details = f"      - {parameter.name}"
                 if parameter.type_annotation:
                     parameter_details += f": {parameter.type_annotation}"
                 if parameter.default_value:
                     parameter_details += f" = {parameter.default_value}"
-                print(parameter_details)
+                emit(parameter_details)
         if function.variables:
-            print("    Local Variables:")
+            emit("    Local Variables:")
             for variable in function.variables:
                 details = f"      - {variable.name}"
                 if variable.value:
                     details += f" = {variable.value}"
-                print(details)
+                emit(details)
         if function.calls_made:
-            print(f"      Calls:")
+            emit(f"      Calls:")
             for call in function.calls_made:
-                print(f"      - {call}")
-    print("\nDetailed Classes:")
+                emit(f"      - {call}")
+    emit("\nDetailed Classes:")
     for class_ in analysis_results.classes:
-        print(f"  - Class: {class_.name} (Lines {class_.start_line}-{class_.end_line})")
+        emit(f"  - Class: {class_.name} (Lines {class_.start_line}-{class_.end_line})")
         if class_.docstring:
-            print(f"    Docstring: {class_.docstring[:50]}...")
+            emit(f"    Docstring: {class_.docstring[:50]}...")
         if class_.attributes:
-            print("    Class Attributes:")
+            emit("    Class Attributes:")
             for attribute in class_.attributes:
                 details = f"      - {attribute.name}"
                 if attribute.type_annotation:
                     details += f": {attribute.type_annotation}"
                 if attribute.value:
                     details += f" = {attribute.value}"
-                print(details)
+                emit(details)
         if class_.methods:
-            print("    Methods:")
+            emit("    Methods:")
             for method in class_.methods:
-                print(f"      - Method: {method.name} (Lines {method.start_line}-{method.end_line})")
+                emit(f"      - Method: {method.name} (Lines {method.start_line}-{method.end_line})")
+    print("\n".join(report))
 
 def save_to_json(analysis_results_list: List['AnalysisResults'], output_file: str):
     """Save analysis results to a JSON file."""
@@ -142,8 +254,13 @@ def save_to_json(analysis_results_list: List['AnalysisResults'], output_file: st
         }
         results.append(result)
     
-    with open(output_file, 'w') as file:
-        json.dump(results, file, indent=2)
+    if orjson is not None:
+        # orjson encodes straight to UTF-8 bytes, much faster than json's pure-Python indent path.
+        with open(output_file, 'wb') as file:
+            file.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w') as file:
+            json.dump(results, file, indent=2)
     print(f"Saved analysis to {output_file}")
 
 def main():
@@ -158,7 +275,7 @@ def main():
     )
     parser.add_argument(
         "--languages",
-        type=str,
+        type=parse_languages,
         default="python,typescript",
         help="Comma-separated languages to analyze (python,typescript,javascript)"
     )
@@ -169,16 +286,22 @@ def main():
         default="console",
         help="Output format (console or json)"
     )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Show the analyzer's per-file status lines, and in json mode also the database retrieval dump"
+    )
     arguments = parser.parse_args()
+    if arguments.verbose:
+        # The per-file status lines are logged here in the parent, which persists every result; warnings from
+        # the workers reach stderr either way.
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
 
-    # Ensure data directory exists
-    data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    database_path = os.path.join(data_dir, 'onboardai.db')
+    database_path = os.path.join(_DATA_DIR, 'onboardai.db')
     database_manager = SQLiteManager(database_path)
 
     # Debug: Check for code_analyzer.py
-    code_analyzer_path = os.path.join(os.path.dirname(__file__), 'code_analyzer.py')
+    code_analyzer_path = os.path.join(_SRC_DIR, 'code_analyzer.py')
     if not os.path.exists(code_analyzer_path):
         print(f"Error: 'code_analyzer.py' not found at {code_analyzer_path}")
         print(f"Current sys.path: {sys.path}")
@@ -186,92 +309,102 @@ def main():
         return
 
     database_manager.connect()
-    database_manager.drop_tables()
-    database_manager.create_tables()
+    # Close the connection (and run its PRAGMA optimize) even when analysis or the dump fails.
+    try:
+        database_manager.drop_tables()
+        database_manager.create_tables()
 
-    print("\n--- Analyzing Sample Code ---")
-    languages_list = [lang.strip().lower() for lang in arguments.languages.split(",")]
-    extensions = []
-    if "python" in languages_list:
-        extensions.append("*.py")
-    if "typescript" in languages_list or "javascript" in languages_list:
-        extensions.extend(["*.ts", "*.tsx", "*.js", "*.jsx"])
+        print("\n--- Analyzing Sample Code ---")
+        # dict.fromkeys drops the extensions shared by typescript and javascript while keeping this order.
+        extensions = list(dict.fromkeys(extension for language, language_extensions in _LANGUAGE_EXTENSIONS.items()
+                                        if language in arguments.languages for extension in language_extensions))
 
-    files_list = []
-    for extension in extensions:
-        files_list.extend(glob.glob(os.path.join(arguments.directory, extension)))
+        # One directory listing instead of a glob pass per extension; files stay grouped in extension order.
+        extension_rank = {extension: rank for rank, extension in enumerate(extensions)}
+        with os.scandir(arguments.directory) as entries:
+            files_list = [entry.path for entry in entries
+                          if not entry.name.startswith(".") and os.path.splitext(entry.name)[1] in extension_rank
+                          and entry.is_file()]
+        files_list.sort(key=lambda file_path: extension_rank[os.path.splitext(file_path)[1]])
 
-    analysis_results_list = []
-    for file_path in files_list:
-        print(f"Processing file: {file_path}...")
-        analysis_results = analyze_file(file_path, database_manager)
-        if analysis_results:
-            analysis_results_list.append(analysis_results)
-            if arguments.output == "console":
+        analysis_results_list = analyze_files(files_list, database_manager)
+        if arguments.output == "console":
+            for analysis_results in analysis_results_list:
                 print_analysis_summary(analysis_results)
 
-    if arguments.output == "json":
-        save_to_json(analysis_results_list, "analysis_output.json")
+        if arguments.output == "json":
+            save_to_json(analysis_results_list, "analysis_output.json")
 
-    print("\n--- Testing Database Retrieval ---")
-    print("\nFiles in Database:")
-    for file_record in database_manager.get_all_files():
-        file_id, file_path, _, checksum, _ = file_record
-        print(f"  File ID: {file_id}, Path: {file_path}, Checksum: {checksum}")
-        variables = database_manager.get_variables_by_scope(file_id=file_id)
-        if variables:
-            print("  Top-Level Variables:")
-            for variable in variables:
-                variable_name = variable[4]
-                variable_value = variable[5]
-                variable_type = variable[6]
-                details = f"    - {variable_name}"
-                if variable_value:
-                    details += f" = {variable_value}"
-                if variable_type:
-                    details += f" (Type: {variable_type})"
-                print(details)
-        functions = database_manager.get_functions_by_file_id(file_id)
-        if functions:
-            print("  Functions (Top-Level):")
-            for function in functions:
-                function_id, _, _, function_name, start_line, end_line, _, _, _ = function
-                print(f"    - Function ID: {function_id}, Name: {function_name}, Lines: {start_line}-{end_line}")
-                print(f"Database: Retrieving parameters for function_id={function_id}")
-                parameters = database_manager.get_parameters_by_function_id(function_id)
-                print(f"Database: Retrieved {len(parameters)} parameters for function_id={function_id}: {parameters}")
-                if parameters:
-                    print("      Parameters:")
-                    for parameter in parameters:
-                        _, _, parameter_name, parameter_type, parameter_default = parameter
-                        parameter_details = f"        - {parameter_name}"
-                        if parameter_type:
-                            parameter_details += f": {parameter_type}"
-                        if parameter_default:
-                            parameter_details += f" = {parameter_default}"
-                        print(parameter_details)
-                variables = database_manager.get_variables_by_scope(function_id=function_id)
+        # The JSON file already holds the results; the retrieval dump is only for console runs or --verbose.
+        if arguments.output != "json" or arguments.verbose:
+            # Like print_analysis_summary, collect the dump and write it once instead of a print per row.
+            report: List[str] = []
+            emit = report.append
+            emit("\n--- Testing Database Retrieval ---")
+            emit("\nFiles in Database:")
+            file_records = database_manager.get_all_files()
+            parameters_by_function, variables_by_function, calls_by_function = \
+                database_manager.get_function_details([file_record[0] for file_record in file_records])
+            for file_record in file_records:
+                file_id, file_path, _, checksum, _ = file_record
+                emit(f"  File ID: {file_id}, Path: {file_path}, Checksum: {checksum}")
+                variables = database_manager.get_variables_by_scope(file_id=file_id)
                 if variables:
-                    print("      Local Variables:")
+                    emit("  Top-Level Variables:")
                     for variable in variables:
                         variable_name = variable[4]
                         variable_value = variable[5]
                         variable_type = variable[6]
-                        details = f"        - {variable_name}"
+                        details = f"    - {variable_name}"
                         if variable_value:
                             details += f" = {variable_value}"
                         if variable_type:
                             details += f" (Type: {variable_type})"
-                        print(details)
-                calls = database_manager.get_function_calls_by_calling_function_id(function_id)
-                if calls:
-                    print("      Calls Made:")
-                    for call in calls:
-                        print(f"        - {call[2]}")
-
-    database_manager.close()
+                        emit(details)
+                functions = database_manager.get_functions_by_file_id(file_id)
+                if functions:
+                    emit("  Functions (Top-Level):")
+                    for function in functions:
+                        function_id, _, _, function_name, start_line, end_line, _, _, _ = function
+                        emit(f"    - Function ID: {function_id}, Name: {function_name}, Lines: {start_line}-{end_line}")
+                        parameters = parameters_by_function.get(function_id, [])
+                        logger.debug("Database: Retrieved %d parameters for function_id=%s: %s",
+                                     len(parameters), function_id, parameters)
+                        if parameters:
+                            emit("      Parameters:")
+                            for parameter in parameters:
+                                _, _, parameter_name, parameter_type, parameter_default = parameter
+                                parameter_details = f"        - {parameter_name}"
+                                if parameter_type:
+                                    parameter_details += f": {parameter_type}"
+                                if parameter_default:
+                                    parameter_details += f" = {parameter_default}"
+                                emit(parameter_details)
+                        variables = variables_by_function.get(function_id, [])
+                        if variables:
+                            emit("      Local Variables:")
+                            for variable in variables:
+                                variable_name = variable[4]
+                                variable_value = variable[5]
+                                variable_type = variable[6]
+                                details = f"        - {variable_name}"
+                                if variable_value:
+                                    details += f" = {variable_value}"
+                                if variable_type:
+                                    details += f" (Type: {variable_type})"
+                                emit(details)
+                        calls = calls_by_function.get(function_id, [])
+                        if calls:
+                            emit("      Calls Made:")
+                            for call in calls:
+                                emit(f"        - {call[2]}")
+            print("\n".join(report))
+    finally:
+        database_manager.close()
     print("\nOnboardAI MVP Demo Finished.")
-    input("\nPress Enter to exit...")
+    # Only wait for a keypress in an interactive terminal, so scripted and timed runs exit right away.
+    if sys.stdin.isatty() and not os.environ.get("ONBOARDAI_NONINTERACTIVE"):
+        input("\nPress Enter to exit...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,249 @@
+# tests/test_code_analyzer.py
+# Run from the project root with: python -m unittest discover -s tests -b
+import pickle
+import unittest
+
+from src import code_analyzer
+from src.code_analyzer import AnalysisResults, CodeAnalyzer, MockDbManager, ParameterInfo, TextEdit
+
+SAMPLE_SOURCE = '''"""Module docstring."""
+LIMIT = 10
+
+def top(a, b=2):
+    """Adds."""
+    return a + b
+
+class Greeter:
+    """Says hello."""
+    greeting = "hi"
+
+    def greet(self, name):
+        return self.greeting + name
+'''
+
+class CachingMockDbManager:
+    """MockDbManager whose AnalysisCache actually keeps what is written to it.
+
+    Wraps rather than subclasses it: interpreted classes can't inherit from the mypyc-compiled build.
+    """
+    def __init__(self) -> None:
+        self._db = MockDbManager()
+        self.analysis_cache: dict = {}
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+    def get_cached_analysis(self, path, content_hash):
+        return self.analysis_cache.get((path, content_hash))
+    def has_cached_analysis(self, path, content_hash):
+        return (path, content_hash) in self.analysis_cache
+    def upsert_cached_analysis(self, path, content_hash, analysis):
+        self.analysis_cache[(path, content_hash)] = analysis
+        return True
+
+class FailingMockDbManager:
+    """MockDbManager whose next get_file_by_path raises once `fail_next_lookup` is set."""
+    def __init__(self) -> None:
+        self._db = MockDbManager()
+        self.fail_next_lookup = False
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+    def get_file_by_path(self, path):
+        if self.fail_next_lookup:
+            self.fail_next_lookup = False
+            raise RuntimeError('lookup failed')
+        return self._db.get_file_by_path(path)
+
+class UnsetAnalysisResults:
+    """Pickles as an AnalysisResults whose fields were never set: what the mypyc build gets from unpickling
+    a pure-Python blob (and the pure-Python build from a compiled one)."""
+    def __reduce__(self):
+        return (AnalysisResults.__new__, (AnalysisResults,))
+
+def python_analyzer(db_manager=None) -> CodeAnalyzer:
+    return CodeAnalyzer('python', db_manager if db_manager is not None else MockDbManager())
+
+class AnalysisCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.db = CachingMockDbManager()
+        self.analyzer = python_analyzer(self.db)
+        self.analyzer.analyze_code(SAMPLE_SOURCE, 'sample.py', retain=True)
+        (self.key,) = self.db.analysis_cache
+
+    def _load(self):
+        checksum = self.key[1].split(':')[0]
+        return self.analyzer._load_cached_analysis('sample.py', checksum, SAMPLE_SOURCE.encode('utf8'))
+
+    def test_round_trip_restores_bodies(self):
+        cached = self._load()
+        self.assertIsNotNone(cached)
+        self.assertEqual([f.name for f in cached.functions], ['top'])
+        self.assertEqual(cached.functions[0].body, '"""Adds."""\n    return a + b')
+        self.assertEqual(cached.classes[0].methods[0].body, 'return self.greeting + name')
+
+    def test_malformed_payloads_are_misses(self):
+        version = self.analyzer._CACHE_FORMAT_VERSION
+        for payload in ([version, AnalysisResults('sample.py')], (version,), (version, 'results'),
+                        (version, AnalysisResults('sample.py'), None), (version - 1, AnalysisResults('sample.py'))):
+            with self.subTest(payload=payload):
+                self.db.analysis_cache[self.key] = pickle.dumps(payload)
+                self.assertIsNone(self._load())
+        self.db.analysis_cache[self.key] = b'not a pickle'
+        self.assertIsNone(self._load())
+
+    def test_blob_from_other_build_is_a_miss(self):
+        self.db.analysis_cache[self.key] = pickle.dumps((self.analyzer._CACHE_FORMAT_VERSION, UnsetAnalysisResults()))
+        self.assertIsNone(self._load())
+        results = self.analyzer.analyze_code(SAMPLE_SOURCE, 'sample.py', retain=True)
+        self.assertEqual([f.name for f in results.functions], ['top'])
+
+    def test_other_builds_entries_are_not_read(self):
+        self.assertTrue(self.key[1].endswith(':' + code_analyzer._BUILD_FLAVOR))
+        other_flavor = 'compiled' if code_analyzer._BUILD_FLAVOR == 'py' else 'py'
+        other_key = (self.key[0], self.key[1].rsplit(':', 1)[0] + ':' + other_flavor)
+        self.db.analysis_cache[other_key] = self.db.analysis_cache.pop(self.key)
+        self.assertIsNone(self._load())
+        self.assertFalse(self.analyzer.has_cached_analysis(SAMPLE_SOURCE, 'sample.py'))
+
+    def test_malformed_payload_is_reanalyzed(self):
+        self.db.analysis_cache[self.key] = pickle.dumps((self.analyzer._CACHE_FORMAT_VERSION, 'results'))
+        results = self.analyzer.analyze_code(SAMPLE_SOURCE, 'sample.py', retain=True)
+        self.assertEqual(results.function_count, 1)
+        self.assertEqual(results.class_count, 1)
+
+class DocstringTest(unittest.TestCase):
+    def docstring_of(self, body):
+        """The docstring recorded for a function whose body is `body` (one line per statement)."""
+        source = 'def f():\n' + ''.join(f'    {line}\n' for line in body.split('\n'))
+        (function,) = python_analyzer().analyze_source(source, 'doc.py').functions
+        return function.docstring
+
+    def test_delimiters_and_prefixes(self):
+        cases = [
+            ('"""Triple "double" quoted."""', 'Triple "double" quoted.'),
+            ("'''Triple 'single' quoted.'''", "Triple 'single' quoted."),
+            ("'Single quoted.'", 'Single quoted.'),
+            ('"Double quoted."', 'Double quoted.'),
+            ('r"""Raw \\d docstring."""', 'Raw \\d docstring.'),
+            ("u'Unicode prefix.'", 'Unicode prefix.'),
+        ]
+        for literal, expected in cases:
+            with self.subTest(literal):
+                self.assertEqual(self.docstring_of(literal), expected)
+
+    def test_escapes_are_kept_as_written(self):
+        self.assertEqual(self.docstring_of('"Says \\"hi\\".\\n"'), 'Says \\"hi\\".\\n')
+
+    def test_multiline_text_is_kept_verbatim(self):
+        source = 'def f():\n    """First line.\n\n    Details.\n    """\n'
+        (function,) = python_analyzer().analyze_source(source, 'doc.py').functions
+        self.assertEqual(function.docstring, 'First line.\n\n    Details.\n    ')
+
+    def test_non_docstrings(self):
+        for body in ('f"""Formatted {x}."""', "F'Formatted.'", 'b"Bytes."', 'rb"Raw bytes."',
+                     'x = 1\n"Not first."', '"Concatenated" " string"', 'return "value"'):
+            with self.subTest(body):
+                self.assertIsNone(self.docstring_of(body))
+
+    def test_class_docstring(self):
+        (class_info,) = python_analyzer().analyze_source("class C:\n    '''Class doc.'''\n", 'doc.py').classes
+        self.assertEqual(class_info.docstring, 'Class doc.')
+
+class AssignmentTest(unittest.TestCase):
+    def variables_of(self, source):
+        return {v.name: (v.value, v.type_annotation)
+                for v in python_analyzer().analyze_source(source, 'assign.py').top_level_variables}
+
+    def test_backslash_continued_value_is_the_right_hand_side(self):
+        # The value used to be recorded as the line-continuation token itself ('\\\n').
+        self.assertEqual(self.variables_of('x = \\\n  1\ny: int = \\\n    [2]\n'),
+                         {'x': ('1', None), 'y': ('[2]', 'int')})
+
+    def test_bare_annotation_has_a_type_and_no_value(self):
+        self.assertEqual(self.variables_of('x: int\n'), {'x': (None, 'int')})
+
+class ParameterMemoTest(unittest.TestCase):
+    def test_functions_with_the_same_signature_do_not_share_parameters(self):
+        source = 'class A:\n    def f(self):\n        pass\n\nclass B:\n    def g(self):\n        pass\n\ndef h(self):\n    pass\n'
+        results = python_analyzer().analyze_source(source, 'memo.py')
+        parameter_lists = [c.methods[0].parameters for c in results.classes] + [results.functions[0].parameters]
+        self.assertEqual(parameter_lists, [[ParameterInfo('self')]] * 3)
+        self.assertEqual(len({id(p) for parameters in parameter_lists for p in parameters}), 3)
+        parameter_lists[0][0].name = 'cls'
+        self.assertEqual([parameters[0].name for parameters in parameter_lists], ['cls', 'self', 'self'])
+
+def node_layout(tree):
+    """Every node's kind and position, in document order; any wrong edit point shows up here."""
+    layout = []
+    stack = [tree.root_node]
+    while stack:
+        node = stack.pop()
+        layout.append((node.type, node.start_byte, node.end_byte, node.start_point, node.end_point))
+        stack.extend(reversed(node.children))
+    return layout
+
+REPARSE_BASE = 'def f(a):\n    """Dok."""\n    s = "héllo wörld"\n    return s\n\nclass C:\n    x = 1\n'
+
+# (name, old source, new source): each edit shape TextEdit.between has to get the points right for.
+REPARSE_CASES = [
+    ('insert at start', REPARSE_BASE, 'import os\n' + REPARSE_BASE),
+    ('delete at start', REPARSE_BASE, REPARSE_BASE[len('def f(a):\n'):]),
+    ('append at end', REPARSE_BASE, REPARSE_BASE + 'def g():\n    return 2\n'),
+    ('truncate at end', REPARSE_BASE, REPARSE_BASE[:-len('    x = 1\n')]),
+    ('insert after multi-byte text', REPARSE_BASE, REPARSE_BASE.replace('wörld"', 'wörld" + "€"')),
+    ('replace multi-byte text', REPARSE_BASE, REPARSE_BASE.replace('héllo', 'hallöö')),
+    ('delete line', REPARSE_BASE, REPARSE_BASE.replace('    s = "héllo wörld"\n', '')),
+    ('insert line', REPARSE_BASE, REPARSE_BASE.replace('    return s\n', '    t = s\n    return t\n')),
+    ('crlf insert line', REPARSE_BASE.replace('\n', '\r\n'),
+     REPARSE_BASE.replace('    return s\n', '    y = "ü"\n    return s\n').replace('\n', '\r\n')),
+    ('crlf edit after multi-byte text', REPARSE_BASE.replace('\n', '\r\n'),
+     REPARSE_BASE.replace('wörld', 'wörld!').replace('\n', '\r\n')),
+    ('identical', REPARSE_BASE, REPARSE_BASE),
+]
+
+class IncrementalReparseTest(unittest.TestCase):
+    def test_reparse_matches_parse_from_scratch(self):
+        for name, old_source, new_source in REPARSE_CASES:
+            with self.subTest(name):
+                analyzer = python_analyzer()
+                analyzer.analyze_code(old_source, 'edited.py')
+                new_bytes = new_source.encode('utf8')
+                incremental = analyzer._reparse('edited.py', new_bytes)
+                self.assertEqual(node_layout(incremental), node_layout(analyzer.parse(new_bytes)))
+
+    def test_analyze_edit_matches_analysis_from_scratch(self):
+        for name, old_source, new_source in REPARSE_CASES:
+            for edits in (None, [TextEdit.between(old_source.encode('utf8'), new_source.encode('utf8'))]):
+                with self.subTest(name, derived=edits is None):
+                    analyzer = python_analyzer()
+                    analyzer.analyze_code(old_source, 'edited.py')
+                    results = analyzer.analyze_edit('edited.py', new_source, edits, retain=True)
+                    self.assertEqual(results, python_analyzer().analyze_source(new_source, 'edited.py'))
+
+    def test_stale_edits_are_derived_again(self):
+        old_source, new_source = REPARSE_BASE, REPARSE_BASE + 'y = 2\n'
+        # Computed against some other, longer source: reaches past the one the tree was cached with.
+        stale = TextEdit.between((old_source * 2).encode('utf8'), (old_source * 2 + 'y = 2\n').encode('utf8'))
+        analyzer = python_analyzer()
+        analyzer.analyze_code(old_source, 'edited.py')
+        results = analyzer.analyze_edit('edited.py', new_source, [stale], retain=True)
+        self.assertEqual(results, python_analyzer().analyze_source(new_source, 'edited.py'))
+
+    def test_failed_analysis_leaves_no_edited_tree_cached(self):
+        db = FailingMockDbManager()
+        analyzer = python_analyzer(db)
+        analyzer.analyze_code(REPARSE_BASE, 'edited.py')
+        new_source = 'import os\n' + REPARSE_BASE
+        db.fail_next_lookup = True
+        with self.assertRaises(RuntimeError):
+            analyzer.analyze_edit('edited.py', new_source,
+                                  [TextEdit.between(REPARSE_BASE.encode('utf8'), new_source.encode('utf8'))])
+        self.assertNotIn('edited.py', analyzer._tree_cache)
+        results = analyzer.analyze_edit('edited.py', new_source, retain=True)
+        self.assertEqual(results, python_analyzer().analyze_source(new_source, 'edited.py'))
+
+    def test_text_edit_points_are_byte_columns(self):
+        edit = TextEdit.between('é = 1\r\n'.encode('utf8'), 'é = 12\r\n'.encode('utf8'))
+        self.assertEqual((edit.start_byte, edit.old_end_byte, edit.new_end_byte), (6, 6, 7))
+        self.assertEqual((edit.start_point, edit.old_end_point, edit.new_end_point), ((0, 6), (0, 6), (0, 7)))
+
+if __name__ == '__main__':
+    unittest.main()